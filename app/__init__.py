@@ -0,0 +1,5 @@
+# .env süreç başına tek yerde, modüller ayarlarını (os.getenv) okumadan önce yüklenir.
+# Mevcut ortam değişkenlerinin üzerine yazmaz.
+from dotenv import load_dotenv
+
+load_dotenv()
@@ -0,0 +1,117 @@
+import os
+import math
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from app.models import take_budget_tokens_async, refund_budget_tokens_async
+
+# Uyarlanabilir aralık: her görevin son ADAPTIVE_HISTORY turundaki reklam durumu tutulur
+ADAPTIVE_HISTORY = int(os.getenv("ADAPTIVE_HISTORY", "8"))
+# Durum değişim oranı bu eşiğin üstündeyse aralık kısaltılır, altındaysa uzatılır
+ADAPTIVE_VOLATILITY_HIGH = float(os.getenv("ADAPTIVE_VOLATILITY_HIGH", "0.3"))
+ADAPTIVE_GROWTH = float(os.getenv("ADAPTIVE_GROWTH", "1.5"))
+ADAPTIVE_SHRINK = float(os.getenv("ADAPTIVE_SHRINK", "0.5"))
+# max_interval_minutes verilmezse üst sınır interval_minutes'ın bu katı olur
+ADAPTIVE_MAX_FACTOR = int(os.getenv("ADAPTIVE_MAX_FACTOR", "8"))
+
+# Günlük SERP kredi bütçesi (0 = sınırsız); çalıştırmalar güne token kovasıyla yayılır
+SERP_DAILY_BUDGET = int(os.getenv("SERP_DAILY_BUDGET", "0"))
+# Kovada birikebilecek en fazla kredi (bir turda ayrılabilecek en fazla SerpAPI isteği)
+SERP_BUDGET_BURST = int(os.getenv("SERP_BUDGET_BURST", "50"))
+BUDGET_NAME = "serp_daily"
+# Bütçe okunamazsa (veritabanı hatası) sorgular bütçesiz çalıştırılmaz, bu kadar saniye ertelenir
+SERP_BUDGET_ERROR_DELAY_S = float(os.getenv("SERP_BUDGET_ERROR_DELAY_S", "60"))
+
+
+def interval_bounds(job) -> Tuple[int, int]:
+    low = max(1, job.min_interval_minutes or job.interval_minutes)
+    high = job.max_interval_minutes or job.interval_minutes * ADAPTIVE_MAX_FACTOR
+    return low, max(low, high)
+
+
+def volatility(history: str) -> float:
+    """Ardışık turlar arasında reklam durumunun değişme oranı (0: hiç değişmedi, 1: her turda değişti)."""
+    if len(history) < 2:
+        return 0.0
+    changes = sum(1 for a, b in zip(history, history[1:]) if a != b)
+    return changes / (len(history) - 1)
+
+
+def choose_interval(job, result: Optional[dict]) -> Tuple[int, str, str]:
+    """
+    Görevin bir sonraki aralığını seçer. Dönüş: (dakika, gerekçe, güncel reklam geçmişi).
+    Sabit modda interval_minutes kullanılır; uyarlanabilir modda durum değiştiyse alt sınıra inilir,
+    oynak görevlerde aralık kısaltılır, stabil görevlerde üst sınıra kadar kademeli olarak uzatılır.
+    """
+    history = job.ad_history or ""
+    current = job.effective_interval_minutes or job.interval_minutes
+    if result is None:
+        if not job.adaptive:
+            return job.interval_minutes, "sabit aralık", history
+        return current, "sorgu başarısız, aralık korundu", history
+
+    history = (history + ("1" if result.get("has_ads") else "0"))[-ADAPTIVE_HISTORY:]
+    if not job.adaptive:
+        return job.interval_minutes, "sabit aralık", history
+
+    low, high = interval_bounds(job)
+    score = volatility(history)
+    if len(history) >= 2 and history[-1] != history[-2]:
+        return low, "reklam durumu değişti, en kısa aralığa inildi", history
+    if score >= ADAPTIVE_VOLATILITY_HIGH:
+        minutes = max(low, min(high, math.floor(current * ADAPTIVE_SHRINK)))
+        return minutes, f"oynak (değişim oranı %{score * 100:.0f}), aralık kısaltıldı", history
+    minutes = max(low, min(high, math.ceil(current * ADAPTIVE_GROWTH)))
+    if minutes == high:
+        return minutes, f"stabil (değişim oranı %{score * 100:.0f}), üst sınırda", history
+    return minutes, f"stabil (değişim oranı %{score * 100:.0f}), aralık uzatıldı", history
+
+
+def plan_next_run(job, result: Optional[dict], now: datetime):
+    """Seçilen aralığı göreve uygular; complete_jobs bu alanları toplu olarak yazar."""
+    minutes, reason, history = choose_interval(job, result)
+    job.effective_interval_minutes = minutes
+    job.interval_reason = reason
+    job.ad_history = history
+    job.next_run_at = now + timedelta(minutes=minutes)
+
+
+async def reserve_credits(costs: List[int]) -> Tuple[int, int, List[float]]:
+    """
+    Sırası korunan sorgular için bütçeden kredi ayırır; `costs` her sorgunun en kötü durumdaki SerpAPI
+    isteği sayısıdır. Dönüş: (çalıştırılabilecek ilk sorgu sayısı, alınan kredi, ertelenen her sorgu için
+    kaç saniye sonra kredi oluşacağı). Ertelenen sorgular böylece bir sonraki tura yığılmak yerine kovanın
+    dolma hızına göre güne yayılır. Harcanmayan kredi tur sonunda refund_credits ile geri verilir.
+    """
+    if SERP_DAILY_BUDGET <= 0 or not costs:
+        return len(costs), 0, []
+    # Kovadan büyük maliyetli bir sorgu hiç çalışamazdı; en fazla kova kadar ayrılır
+    costs = [min(cost, SERP_BUDGET_BURST) for cost in costs]
+    taken, left = await take_budget_tokens_async(BUDGET_NAME, sum(costs), SERP_DAILY_BUDGET, SERP_BUDGET_BURST)
+    allowed, reserved = 0, 0
+    for cost in costs:
+        if reserved + cost > taken:
+            break
+        reserved += cost
+        allowed += 1
+    rate = SERP_DAILY_BUDGET / 86400
+    # Sığmayan kısım da tur sonunda kovaya döner
+    available = left + taken - reserved
+    delays, needed = [], 0
+    for cost in costs[allowed:]:
+        needed += cost
+        delays.append(max(1.0, (needed - available) / rate))
+    return allowed, taken, delays
+
+
+async def refund_credits(taken: int, used: int):
+    """reserve_credits ile alınıp gerçekte harcanmayan krediyi kovaya geri verir."""
+    if SERP_DAILY_BUDGET <= 0 or taken == used:
+        return
+    await refund_budget_tokens_async(BUDGET_NAME, taken - used, SERP_BUDGET_BURST)
+
+
+def defer_job(job, delay_seconds: float, now: datetime, reason: str = "günlük kredi bütçesi doldu"):
+    """Bütçe yetmediği (veya okunamadığı) için çalıştırılmayan görevi `delay_seconds` sonraya erteler."""
+    job.next_run_at = now + timedelta(seconds=delay_seconds)
+    job.interval_reason = f"{reason}, {math.ceil(delay_seconds / 60)} dk ertelendi"
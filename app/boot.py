@@ -0,0 +1,42 @@
+import time
+import logging
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from app.metrics import STARTUP_PHASE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Açılış aşamalarının sürelerini toplar; açılış bitince tek satırlık bir rapor loglanır ve
+    startup_phase_seconds metriğine yazılır. Soğuk başlangıçta sürenin nereye gittiğini gösterir.
+    """
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float):
+        self.phases.append((name, seconds))
+        STARTUP_PHASE_SECONDS.set(round(seconds, 4), phase=name)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def report(self) -> dict:
+        phases = {name: round(seconds * 1000, 1) for name, seconds in self.phases}
+        return {"total_ms": round(sum(phases.values()), 1), "phases_ms": phases}
+
+    def log(self):
+        report = self.report()
+        breakdown = ", ".join(f"{name}={ms}ms" for name, ms in report["phases_ms"].items())
+        logger.info("Açılış %.1f ms sürdü (%s).", report["total_ms"], breakdown, extra=report)
+
+
+startup_timer = StartupTimer()
@@ -2,9 +2,7 @@ import os
 import sys
 import httpx
 import datetime as dt
-from dotenv import load_dotenv
-
-load_dotenv()
+from typing import Optional
 
 # Proje yolunu ekle
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -13,11 +11,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from aiogram import Bot, Dispatcher, types
 from aiogram.filters import Command
 # --- BİTTİ ---
+from app.prefs import user_prefs
 
 # --- Ortam Değişkenleri ve Sabitler ---
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
-if not BOT_TOKEN:
-    raise RuntimeError("TELEGRAM_BOT_TOKEN .env dosyasında eksik!")
 
 # Render'da, bot ve API aynı yerde çalışacak.
 # API_BASE'i .env'den al, yoksa Render'ın varsayılanını kullan
@@ -26,17 +23,56 @@ API_BASE = os.getenv("API_BASE", "http://127.0.0.1:10000")
 DEFAULT_GL = os.getenv("DEFAULT_GL", "tr")
 DEFAULT_HL = os.getenv("DEFAULT_HL", "tr")
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher() # v3'te dispatcher böyle başlatılır
-
-USER_DEVICE = {}
-USER_LOCATION = {}
+# auto: API ile aynı süreçte çalışıyorsa doğrudan servisi çağır, değilse API_BASE'e HTTP isteği at
+# inprocess / http: davranışı zorla
+BOT_API_MODE = os.getenv("BOT_API_MODE", "auto")
+_in_process = BOT_API_MODE == "inprocess"
+_api_client: Optional[httpx.AsyncClient] = None
 
-def get_device(uid: int) -> str:
-    return USER_DEVICE.get(uid, "desktop")
+_bot: Optional[Bot] = None
+dp = Dispatcher() # v3'te dispatcher böyle başlatılır
 
-def get_location(uid: int) -> str:
-    return USER_LOCATION.get(uid)
+def get_bot() -> Bot:
+    """Bot ilk kullanımda oluşturulur; token sadece bot gerçekten çalıştırılacaksa gerekir."""
+    global _bot
+    if _bot is None:
+        if not BOT_TOKEN:
+            raise RuntimeError("TELEGRAM_BOT_TOKEN .env dosyasında eksik!")
+        _bot = Bot(token=BOT_TOKEN)
+    return _bot
+
+def enable_in_process():
+    """main.py botu API ile aynı süreçte başlattığında çağrılır."""
+    global _in_process
+    if BOT_API_MODE != "http":
+        _in_process = True
+
+def _get_api_client() -> httpx.AsyncClient:
+    global _api_client
+    if _api_client is None or _api_client.is_closed:
+        _api_client = httpx.AsyncClient(base_url=API_BASE, timeout=httpx.Timeout(30, connect=5))
+    return _api_client
+
+async def close_api_client():
+    global _api_client
+    if _api_client is not None:
+        await _api_client.aclose()
+        _api_client = None
+
+async def _check(payload: dict) -> dict:
+    if _in_process:
+        # Aynı süreçteki servis: HTTP, JSON ve FastAPI doğrulama katmanları atlanır
+        from app.checks import run_check
+        return await run_check(payload["query"], gl=payload["gl"], hl=payload["hl"], device=payload["device"], location=payload.get("location"))
+    r = await _get_api_client().post("/v1/check", json=payload)
+    r.raise_for_status()
+    return r.json()
+
+async def get_device(uid: int) -> str:
+    return (await user_prefs.get(uid))["device"]
+
+async def get_location(uid: int) -> Optional[str]:
+    return (await user_prefs.get(uid))["location"]
 
 # --- GÜNCELLENDİ: v3 Komut formatı ---
 @dp.message(Command("start", "help"))
@@ -59,7 +95,7 @@ async def set_mobile_mode(m: types.Message):
     parts = m.text.split()
     if len(parts) >= 2 and parts[1].lower() in ("on", "off"):
         mode = "mobile" if parts[1].lower() == "on" else "desktop"
-        USER_DEVICE[m.from_user.id] = mode
+        await user_prefs.update(m.from_user.id, device=mode)
         await m.reply(f"✅ Arama modu `{mode}` olarak ayarlandı.")
     else:
         await m.reply("Kullanım: `/mobile on` veya `/mobile off`")
@@ -67,7 +103,7 @@ async def set_mobile_mode(m: types.Message):
 # --- GÜNCELLENDİ: v3 Komut formatı ---
 @dp.message(Command("mode"))
 async def get_current_mode(m: types.Message):
-    current_mode = get_device(m.from_user.id)
+    current_mode = await get_device(m.from_user.id)
     await m.reply(f"ℹ️ Cihaz modu: `{current_mode}`")
 
 # --- GÜNCELLENDİ: v3 Komut formatı ---
@@ -76,11 +112,11 @@ async def set_location(m: types.Message):
     # .get_args() v2'de kaldı, v3'te manuel ayıklama daha garanti
     location_query = m.text.replace("/location", "").strip()
     if location_query:
-        USER_LOCATION[m.from_user.id] = location_query
+        await user_prefs.update(m.from_user.id, location=location_query)
         await m.reply(f"✅ Konum başarıyla `{location_query}` olarak ayarlandı.")
     else:
-        if m.from_user.id in USER_LOCATION:
-            del USER_LOCATION[m.from_user.id]
+        if await get_location(m.from_user.id):
+            await user_prefs.update(m.from_user.id, location=None)
         await m.reply("ℹ️ Konum sıfırlandı. Artık genel arama yapılacak.")
 
 # --- GÜNCELLENDİ: v3 "diğer tüm mesajlar" formatı ---
@@ -94,8 +130,9 @@ async def run_query(m: types.Message):
     if not query:
         return await m.reply("Lütfen boş mesaj göndermeyin.")
 
-    dev = get_device(m.from_user.id)
-    loc = get_location(m.from_user.id)
+    # Önbellekten okunur; DB'ye sadece önbellekte olmayan kullanıcı için gidilir
+    prefs = await user_prefs.get(m.from_user.id)
+    dev, loc = prefs["device"], prefs["location"]
     
     location_info = f" ({loc})" if loc else ""
     wait_message = await m.reply(f"⏳ `{query}` için reklamlar aranıyor...\nCihaz: `{dev}`{location_info}")
@@ -105,11 +142,10 @@ async def run_query(m: types.Message):
         payload["location"] = loc
 
     try:
-        async with httpx.AsyncClient(timeout=30) as client:
-            r = await client.post(f"{API_BASE}/v1/check", json=payload)
-            r.raise_for_status()
-            data = r.json()
+        data = await _check(payload)
     except Exception as e:
+        if _in_process:
+            return await wait_message.edit_text(f"🚨 Hata: Reklam kontrolü yapılamadı.\nDetay: {e}")
         return await wait_message.edit_text(f"🚨 Hata: API servisine bağlanılamadı.\nDetay: {e}")
 
     if data.get("has_ads"):
@@ -0,0 +1,116 @@
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+class AsyncTTLCache:
+    """
+    Boyutu sınırlı (LRU) ve süreli (TTL) bellek içi önbellek.
+    Aynı anahtar için eşzamanlı gelen istekler tek bir çağrıyı paylaşır (single-flight).
+    set() ile yapılan yazma, o anahtar için sürmekte olan yüklemeyi geçersiz kılar; yükleme
+    bittiğinde eski değeri önbelleğe yazmaz.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Başladıktan sonra anahtarına yazma yapılmış (sonucu bayat) yüklemeler
+        self._invalidated: Set[asyncio.Future] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_size > 0
+
+    def get(self, key: Hashable, max_age: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """(değer, yaş_saniye) döner; kayıt yoksa veya max_age/TTL'den eskiyse None."""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        stored_at, value = item
+        age = time.monotonic() - stored_at
+        limit = self.ttl if max_age is None else min(max_age, self.ttl)
+        if age > limit:
+            if age > self.ttl:
+                del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value, age
+
+    def set(self, key: Hashable, value: Any) -> None:
+        pending = self._inflight.pop(key, None)
+        if pending is not None:
+            # Yazmadan önce başlamış yükleme eski değeri okumuş olabilir; yeni gelenler ona katılmasın
+            self._invalidated.add(pending)
+        self._store(key, value)
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        max_age: Optional[float] = None,
+    ) -> Tuple[Any, Optional[float]]:
+        """
+        Önbellekte taze kayıt varsa onu, yoksa loader() sonucunu döner.
+        Dönüş: (değer, yaş_saniye) — yaş None ise değer bu çağrıda üretilmiştir.
+        max_age=0 önbelleği ve devam eden yüklemeleri atlar; her zaman yeni bir yükleme başlatır.
+        """
+        hit = self.get(key, max_age)
+        if hit is not None:
+            return hit
+
+        pending = self._inflight.get(key)
+        if pending is not None and max_age == 0:
+            # Önbelleği atlayan istek, kendisinden önce başlamış yüklemeye katılmaz; o yükleme bitince
+            # bu isteğin daha yeni sonucunu ezmesin diye geçersiz sayılır
+            self._invalidated.add(pending)
+            pending = None
+        if pending is not None:
+            try:
+                # Devam eden çağrının sonucu zaten taze; ona katıl
+                return await asyncio.shield(pending), 0.0
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Çağrıyı başlatan istek iptal edildi; kendimiz yükleyelim
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception never retrieved" uyarısını engelle
+            future.exception()
+            raise
+        else:
+            if future in self._invalidated:
+                # Yükleme sürerken daha yeni bir değer yazıldı; onu ezme, yenisini döndür
+                hit = self.get(key)
+                if hit is not None:
+                    value = hit[0]
+            else:
+                self._store(key, value)
+            future.set_result(value)
+            return value, None
+        finally:
+            self._invalidated.discard(future)
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
@@ -0,0 +1,43 @@
+import asyncio
+from typing import AsyncIterator, List, Optional
+
+from app.serp import check_ads
+from app.log_sink import log_sink, row_from_result
+
+
+async def run_check(query: str, gl: str, hl: str, device: str = "desktop", location: Optional[str] = None, **options) -> dict:
+    """
+    /v1/check ve süreç içi bot için ortak yol: reklam kontrolü yapar ve SearchLog kaydını log kuyruğuna ekler.
+    options check_ads'e aynen iletilir (max_age, strategy_mode, hedge_delay_ms).
+    """
+    res = await check_ads(query, gl=gl, hl=hl, device=device, location=location, **options)
+    await log_sink.submit(row_from_result(res))
+    return res
+
+
+async def run_checks_stream(items: List[dict], concurrency: int, gl: str, hl: str, **options) -> AsyncIterator[dict]:
+    """
+    items içindeki sorguları (query, device, location) en fazla `concurrency` eşzamanlı çalıştırır ve
+    her sonucu biter bitmez üretir: {"index", "query", "result", "error"}.
+    Bir öğenin hatası diğerlerini durdurmaz; tüketici ayrılırsa kalan işler iptal edilir.
+    """
+    results: asyncio.Queue = asyncio.Queue()
+    pending = iter(enumerate(items))
+
+    async def worker():
+        for index, item in pending:
+            out = {"index": index, "query": item["query"], "result": None, "error": None}
+            try:
+                out["result"] = await run_check(item["query"], gl=gl, hl=hl, device=item.get("device", "desktop"), location=item.get("location"), **options)
+            except Exception as e:
+                out["error"] = str(e) or e.__class__.__name__
+            await results.put(out)
+
+    workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -0,0 +1,142 @@
+import os
+import time
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from app.models import list_active_jobs_async, get_jobs_by_ids_async, claim_due_jobs_async
+from app.scheduler import run_jobs, tick_lock, WORKER_ID, JOB_LEASE_SECONDS
+from app.metrics import SCHEDULER_TICK_SECONDS
+
+# "internal" ise zamanlayıcı API süreci içinde çalışır, harici cron'a gerek kalmaz
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "cron")
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerEngine:
+    """
+    Süreç içi zamanlayıcı. Aktif görevlerin next_run_at değerlerini bellekteki bir min-heap'te tutar,
+    en yakın zamana kadar uyur ve sadece zamanı gelen görevleri veritabanından okuyup çalıştırır.
+    /v1/jobs ile eklenen/silinen görevler schedule()/unschedule() ile kuyruğa yansıtılır.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int]] = []
+        # job_id -> geçerli next_run_at; heap'teki eski kayıtlar bununla ayıklanır
+        self._deadlines: Dict[int, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        await self._load()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Süreç içi zamanlayıcı başlatıldı (%d aktif görev).", len(self._deadlines))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def schedule(self, job_id: int, next_run_at: datetime):
+        """Görevi kuyruğa ekler veya zamanını günceller."""
+        if not self.running:
+            return
+        self._deadlines[job_id] = next_run_at
+        heapq.heappush(self._heap, (next_run_at, job_id))
+        self._wakeup.set()
+
+    def unschedule(self, job_id: int):
+        if not self.running:
+            return
+        # Heap'teki kayıt tembel şekilde, sırası geldiğinde atlanır
+        self._deadlines.pop(job_id, None)
+
+    async def _load(self):
+        jobs = await list_active_jobs_async()
+        self._heap.clear()
+        self._deadlines.clear()
+        for job in jobs:
+            self._deadlines[job.id] = job.next_run_at
+            self._heap.append((job.next_run_at, job.id))
+        heapq.heapify(self._heap)
+
+    def _discard_stale(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _pop_due(self, now: datetime) -> List[int]:
+        due = []
+        while True:
+            self._discard_stale()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, job_id = heapq.heappop(self._heap)
+            del self._deadlines[job_id]
+            due.append(job_id)
+
+    async def _sleep_until_next(self):
+        self._discard_stale()
+        self._wakeup.clear()
+        timeout = None
+        if self._heap:
+            timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            await self._sleep_until_next()
+            due_ids = self._pop_due(datetime.utcnow())
+            if not due_ids:
+                continue
+            try:
+                await self._run_due(due_ids)
+            except Exception as e:
+                logger.exception("Süreç içi zamanlayıcı turunda hata: %s", e)
+                # Kuyruktan çıkarılmış görevler kaybolmasın diye kuyruğu veritabanından yeniden kur
+                await asyncio.sleep(5)
+                try:
+                    await self._load()
+                except Exception as e:
+                    logger.error("Zamanlayıcı kuyruğu yeniden yüklenemedi: %s", e)
+
+    async def _run_due(self, due_ids: List[int]):
+        t0 = time.perf_counter()
+        async with tick_lock:
+            # Sadece hâlâ zamanı gelmiş ve başka bir worker'ca kiralanmamış görevler alınır;
+            # bu arada harici cron veya başka bir node tarafından çalıştırılanlar atlanır
+            jobs = await claim_due_jobs_async(WORKER_ID, len(due_ids), JOB_LEASE_SECONDS, job_ids=due_ids)
+            if jobs:
+                stats = await run_jobs(jobs)
+                SCHEDULER_TICK_SECONDS.observe(time.perf_counter() - t0, source="internal")
+                logger.info("Zamanlayıcı turu: %d görev, %d sorgu, %d ms.",
+                            stats["jobs"], stats["queries"], int((time.perf_counter() - t0) * 1000))
+            # Çalıştırılan görevlerin yeni next_run_at değerlerini kuyruğa geri koy
+            now = datetime.utcnow()
+            for job in await get_jobs_by_ids_async(due_ids):
+                if job.is_active and job.id not in self._deadlines:
+                    next_run_at = job.next_run_at
+                    if next_run_at <= now:
+                        # Güncelleme başarısız olduysa görevi sürekli tekrar çalıştırma
+                        next_run_at = now + timedelta(minutes=job.interval_minutes)
+                    self._deadlines[job.id] = next_run_at
+                    heapq.heappush(self._heap, (next_run_at, job.id))
+
+
+scheduler_engine = SchedulerEngine()
@@ -0,0 +1,210 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+# Varsayılan anahtar başına eşzamanlı istek sınırı; verilmezse HTTP bağlantı havuzu boyutu
+# (SERPAPI_MAX_CONNECTIONS) kullanılır, böylece tek anahtarlı kurulumda ek bir darboğaz oluşmaz
+SERPAPI_KEY_CONCURRENCY = int(os.getenv("SERPAPI_KEY_CONCURRENCY") or os.getenv("SERPAPI_MAX_CONNECTIONS", "20"))
+# 429 dönen anahtar bu süre boyunca rotasyondan çıkarılır
+SERPAPI_KEY_COOLDOWN_S = float(os.getenv("SERPAPI_KEY_COOLDOWN_S", "60"))
+# Devre kesici: art arda bu kadar upstream hatasında devre açılır, bu süre sonra tek deneme yapılır
+SERPAPI_BREAKER_THRESHOLD = int(os.getenv("SERPAPI_BREAKER_THRESHOLD", "5"))
+SERPAPI_BREAKER_RESET_S = float(os.getenv("SERPAPI_BREAKER_RESET_S", "30"))
+# Tekrar denemeler: tam jitter'lı üstel bekleme
+SERPAPI_MAX_RETRIES = int(os.getenv("SERPAPI_MAX_RETRIES", "2"))
+SERPAPI_BACKOFF_BASE_MS = int(os.getenv("SERPAPI_BACKOFF_BASE_MS", "200"))
+SERPAPI_BACKOFF_MAX_MS = int(os.getenv("SERPAPI_BACKOFF_MAX_MS", "2000"))
+
+logger = logging.getLogger(__name__)
+
+
+class NoKeyAvailableError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class ApiKey:
+    """Havuzdaki tek bir SerpAPI anahtarı ve durumu."""
+
+    def __init__(self, value: str, weight: float = 1.0, concurrency: int = SERPAPI_KEY_CONCURRENCY):
+        self.value = value
+        self.weight = weight
+        self.concurrency = max(1, concurrency)
+        self.in_flight = 0
+        # None: bilinmiyor (hesap bilgisi alınamadı); sayı: kalan arama kredisi
+        self.remaining: Optional[int] = None
+        self.disabled = False
+        self.cooldown_until = 0.0
+        self.successes = 0
+        self.failures = 0
+
+    @property
+    def label(self) -> str:
+        return f"...{self.value[-4:]}"
+
+    def usable(self, now: float) -> bool:
+        return not self.disabled and now >= self.cooldown_until and (self.remaining is None or self.remaining > 0)
+
+    def snapshot(self) -> dict:
+        return {
+            "key": self.label,
+            "weight": self.weight,
+            "in_flight": self.in_flight,
+            "concurrency": self.concurrency,
+            "remaining": self.remaining,
+            "disabled": self.disabled,
+            "cooling_down": time.monotonic() < self.cooldown_until,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+def parse_keys(spec: str) -> List[ApiKey]:
+    """
+    "anahtar[:ağırlık[:eşzamanlılık]],..." biçimindeki listeyi çözer.
+    Örnek: SERPAPI_KEYS=abc:2:10,def → abc iki kat sık seçilir ve 10 eşzamanlı istek alır.
+    """
+    keys = []
+    for item in spec.split(","):
+        parts = item.strip().split(":")
+        if not parts[0]:
+            continue
+        weight = float(parts[1]) if len(parts) > 1 and parts[1] else 1.0
+        concurrency = int(parts[2]) if len(parts) > 2 and parts[2] else SERPAPI_KEY_CONCURRENCY
+        keys.append(ApiKey(parts[0], weight, concurrency))
+    return keys
+
+
+class KeyPool:
+    """
+    Ağırlıklı rotasyonla anahtar seçer; anahtar başına eşzamanlılık sınırı ve kalan kredi takibi yapar.
+    401 dönen anahtar kalıcı olarak, 429 dönen anahtar SERPAPI_KEY_COOLDOWN_S süresince rotasyondan çıkar.
+    """
+
+    def __init__(self, keys: List[ApiKey]):
+        self.keys = keys
+        self._available = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _candidates(self) -> List[ApiKey]:
+        now = time.monotonic()
+        return [k for k in self.keys if k.usable(now) and k.in_flight < k.concurrency]
+
+    def _any_usable(self) -> bool:
+        now = time.monotonic()
+        return any(k.usable(now) for k in self.keys)
+
+    @asynccontextmanager
+    async def acquire(self, exclude: Optional[ApiKey] = None) -> AsyncIterator[ApiKey]:
+        async with self._available:
+            while True:
+                candidates = self._candidates()
+                if exclude is not None and len(candidates) > 1:
+                    candidates = [k for k in candidates if k is not exclude]
+                if candidates:
+                    key = random.choices(candidates, weights=[k.weight for k in candidates])[0]
+                    key.in_flight += 1
+                    break
+                if not self._any_usable():
+                    # Bekleyen diğerleri de aynı durumu görüp hata alsın (yoksa sonsuza kadar beklerler)
+                    self._available.notify_all()
+                    raise NoKeyAvailableError("Kullanılabilir SerpAPI anahtarı yok (geçersiz, kota dolu veya beklemede).")
+                # Tüm anahtarlar eşzamanlılık sınırında; bir slot boşalana kadar bekle
+                await self._available.wait()
+        try:
+            yield key
+        finally:
+            async with self._available:
+                key.in_flight -= 1
+                # Tümü uyandırılır: boşalan slot bekleyenlerin hariç tuttuğu anahtar olabilir veya
+                # anahtar bu arada devre dışı kalmış olabilir (bekleyenler NoKeyAvailableError almalı)
+                self._available.notify_all()
+
+    def report_success(self, key: ApiKey):
+        key.successes += 1
+        if key.remaining is not None:
+            key.remaining -= 1
+
+    async def report_status(self, key: ApiKey, status: int):
+        key.failures += 1
+        if status == 401:
+            key.disabled = True
+            logger.warning("SerpAPI anahtarı %s geçersiz (401), havuzdan çıkarıldı.", key.label)
+        elif status == 429:
+            key.cooldown_until = time.monotonic() + SERPAPI_KEY_COOLDOWN_S
+            logger.warning("SerpAPI anahtarı %s limitte (429), %.0f sn beklemeye alındı.", key.label, SERPAPI_KEY_COOLDOWN_S)
+        else:
+            return
+        # Bekleyenler havuzun yeni durumunu yeniden değerlendirsin
+        async with self._available:
+            self._available.notify_all()
+
+    def snapshot(self) -> List[dict]:
+        return [k.snapshot() for k in self.keys]
+
+
+class CircuitBreaker:
+    """
+    closed → (art arda `threshold` hata) → open → (`reset_after` sn) → half-open → tek deneme
+    başarılıysa closed, değilse tekrar open. Devre açıkken istekler beklemeden reddedilir.
+    """
+
+    def __init__(self, threshold: int = SERPAPI_BREAKER_THRESHOLD, reset_after: float = SERPAPI_BREAKER_RESET_S):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def before_request(self) -> bool:
+        """İsteğe izin verilip verilmediğini kontrol eder. Yarı açık durumdaki deneme isteği ise True döner."""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError("SerpAPI şu an sağlıksız görünüyor (devre açık), istek atlanıyor.")
+        if state == "half-open":
+            if self._trial_in_flight:
+                raise CircuitOpenError("SerpAPI devresi yarı açık, deneme isteği sürüyor.")
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        was_trial = self._trial_in_flight
+        self._trial_in_flight = False
+        if was_trial or self.failures >= self.threshold:
+            if self.opened_at is None or was_trial:
+                logger.error("SerpAPI devresi açıldı (%d art arda hata).", self.failures)
+            self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Deneme isteği sağlık sonucu üretmeden bittiyse (örn. 401, iptal) yeni denemeye izin ver."""
+        self._trial_in_flight = False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Tam jitter'lı üstel bekleme süresi (saniye)."""
+    cap = min(SERPAPI_BACKOFF_MAX_MS, SERPAPI_BACKOFF_BASE_MS * (2 ** attempt))
+    return random.uniform(0, cap) / 1000
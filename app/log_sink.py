@@ -0,0 +1,157 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models import add_logs_async
+
+# Bir seferde yazılacak en fazla satır ve en uzun bekleme süresi
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "100"))
+LOG_FLUSH_MS = int(os.getenv("LOG_FLUSH_MS", "1000"))
+LOG_QUEUE_MAX = int(os.getenv("LOG_QUEUE_MAX", "10000"))
+# Kuyruk doluyken: "drop" yeni satırı atar, "block" yer açılana kadar bekler
+LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop")
+
+logger = logging.getLogger(__name__)
+
+
+def row_from_result(res: dict) -> Dict[str, Any]:
+    """check_ads sonucundan bir SearchLog satırı üretir."""
+    return {
+        "query": res["query"],
+        "has_ads": res["has_ads"],
+        "ads_count": res["ads_count"],
+        "types": ",".join(res["types"]),
+        "device": res["device"],
+        "gl": res["gl"],
+        "hl": res["hl"],
+        "latency_ms": res["latency_ms"],
+        "created_at": datetime.utcnow(),
+        "cached": bool(res.get("cached")),
+    }
+
+
+class LogSink:
+    """
+    SearchLog satırlarını bellekteki sınırlı bir kuyrukta biriktirir ve arka planda,
+    LOG_BATCH_SIZE satırda bir veya LOG_FLUSH_MS milisaniyede bir toplu INSERT ile yazar.
+    """
+
+    def __init__(self, batch_size: int = LOG_BATCH_SIZE, flush_ms: int = LOG_FLUSH_MS,
+                 max_queue: int = LOG_QUEUE_MAX, policy: str = LOG_QUEUE_POLICY):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_ms / 1000
+        self.max_queue = max_queue
+        self.policy = policy
+        self.dropped = 0
+        self.written = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Toplanmakta olan batch ve yazılmakta olan flush; kapanışta kaybolmamaları için saklanır
+        self._pending: List[Dict[str, Any]] = []
+        self._inflight: Optional[asyncio.Future] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Worker'ı durdurur ve kuyrukta bekleyen satırları yazar."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None and not self._inflight.done():
+            await self._inflight
+        rows, self._pending = self._pending, []
+        if self._queue is not None:
+            while not self._queue.empty():
+                rows.append(self._queue.get_nowait())
+        for i in range(0, len(rows), self.batch_size):
+            await self._flush(rows[i:i + self.batch_size])
+
+    async def submit(self, row: Dict[str, Any]) -> bool:
+        """Satırı kuyruğa ekler. Satır atıldıysa False döner."""
+        if not self.running:
+            self.start()
+        if self.policy == "block":
+            await self._queue.put(row)
+            return True
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning("Log kuyruğu dolu, satır atıldı (toplam atılan: %d).", self.dropped)
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        if not batch:
+            return
+        try:
+            await add_logs_async(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.error("%d log satırı yazılamadı: %s", len(batch), e)
+
+    async def _get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Kuyruktan en fazla `timeout` saniye bekleyerek bir satır alır; gelmezse None. wait_for kullanılmaz:
+        Python 3.11'de iptal (stop()) get() bittiği anda gelirse kuyruktan alınmış satır kaybolabilir.
+        Burada alınmış satır iptalde de _pending'e eklenir ve kapanışta yazılır.
+        """
+        getter = asyncio.ensure_future(self._queue.get())
+        try:
+            await asyncio.wait({getter}, timeout=timeout)
+        except asyncio.CancelledError:
+            if getter.done() and not getter.cancelled():
+                self._pending.append(getter.result())
+            else:
+                getter.cancel()
+            raise
+        if getter.done():
+            return getter.result()
+        # Bekleyen get() iptal edilir; henüz kuyruktan bir şey almamıştır
+        getter.cancel()
+        return None
+
+    async def _run(self):
+        while True:
+            self._pending.append(await self._queue.get())
+            deadline = time.monotonic() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                row = await self._get(timeout)
+                if row is None:
+                    break
+                self._pending.append(row)
+            batch, self._pending = self._pending, []
+            # Yazma işlemi iptalden korunur; stop() bitmesini bekler
+            self._inflight = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._inflight)
+
+
+log_sink = LogSink()
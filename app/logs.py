@@ -0,0 +1,70 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Optional
+
+# DEBUG | INFO | WARNING | ERROR
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# text: okunabilir satırlar | json: satır başına bir JSON nesnesi (log toplayıcılar için)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# LogRecord'un standart alanları; bunların dışındakiler `extra=` ile verilmiş yapısal alanlardır
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RESERVED}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        payload.update(_extra_fields(record))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", datefmt="%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = _extra_fields(record)
+        if extra:
+            line += " " + " ".join(f"{k}={v}" for k, v in extra.items())
+        return line
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    `app` loglarını seviye filtresiyle stdout'a yönlendirir. Kayıtlar bir kuyruğa bırakılır ve
+    ayrı bir thread'de yazılır; event loop'ta çalışan kod stdout yazımını beklemez. Birden çok çağrı zararsızdır.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger("app")
+    root.setLevel(getattr(logging, level, logging.INFO))
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
@@ -1,43 +1,124 @@
+import time
+
+# Açılış raporundaki "import" aşaması için (uvicorn bu modülü import ettiği an başlar)
+_import_started = time.perf_counter()
+
 import os
 import sys
+import json
 import asyncio
+import logging
 from typing import Literal, Optional, List
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Header
 from pydantic import BaseModel, Field
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response, ORJSONResponse
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
 
-load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app.serp import check_ads
-from app.models import init_db, add_log, list_logs, SearchLog, ScheduledJob, add_job, list_all_jobs, delete_job_by_id
+from app.serp import open_client, close_client, quota_refresh_loop, serpapi_status
+from app.checks import run_check, run_checks_stream
+from app.models import init_db_async, backfill_rollups_async, DB_AUTO_MIGRATE, ScheduledJob, add_job_async, list_all_jobs_async, delete_job_by_id_async, query_stats_async, list_ad_history_async, count_due_jobs_async, partitioning_enabled
 
-# Botu ve zamanlayıcı fonksiyonunu import et
-from app.bot import dp, bot 
+# Zamanlayıcı fonksiyonunu import et (bot/aiogram sadece gerektiğinde on_startup'ta yüklenir)
 from app.scheduler import run_job_once
+from app.engine import scheduler_engine, SCHEDULER_MODE
+from app.log_sink import log_sink
+from app.notifier import notifier
+from app.retention import retention_loop, partition_loop, LOG_RETENTION_DAYS
+from app.webhook import BOT_UPDATE_MODE, TELEGRAM_WEBHOOK_SECRET, update_queue, register_webhook, verify_secret
+from app.logs import setup_logging
+from app.metrics import REGISTRY, CONTENT_TYPE, SCHEDULER_DUE_BACKLOG, COMPONENT_STATS
+from app.boot import startup_timer
 
 DEFAULT_GL = os.getenv("DEFAULT_GL", "tr")
 DEFAULT_HL = os.getenv("DEFAULT_HL", "tr")
 CRON_SECRET = os.getenv("CRON_SECRET")
+# Toplu kontrol: istek başına en fazla öğe ve eşzamanlı sorgu
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "5000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "10"))
 
 app = FastAPI(title="Ads Checker API")
+startup_timer.record("import", time.perf_counter() - _import_started)
+
+logger = logging.getLogger("app.main")
 
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static')
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 @app.on_event("startup")
 async def on_startup():
-    init_db() 
-    print("Web API'si başlatıldı, Telegram Botu arka planda başlatılıyor...")
-    asyncio.create_task(dp.start_polling(bot))
+    setup_logging()
+    with startup_timer.phase("db_schema"):
+        await init_db_async()
+    with startup_timer.phase("http_clients"):
+        await open_client()
+    with startup_timer.phase("background_tasks"):
+        app.state.quota_task = asyncio.create_task(quota_refresh_loop())
+        log_sink.start()
+        notifier.start()
+        if SCHEDULER_MODE == "internal":
+            await scheduler_engine.start()
+        if LOG_RETENTION_DAYS > 0:
+            app.state.retention_task = asyncio.create_task(retention_loop())
+        if partitioning_enabled():
+            app.state.partition_task = asyncio.create_task(partition_loop())
+        if DB_AUTO_MIGRATE:
+            # Eski logların rollup'a işlenmesi uzun sürebilir; açılışı bekletmez (sınırı init_db kaydetti)
+            app.state.backfill_task = asyncio.create_task(_backfill_rollups())
+    if BOT_UPDATE_MODE == "off":
+        logger.info("Web API'si başlatıldı (BOT_UPDATE_MODE=off, Telegram güncellemeleri bu süreçte alınmıyor).")
+    else:
+        with startup_timer.phase("bot"):
+            await _start_bot()
+    startup_timer.log()
+
+async def _backfill_rollups():
+    try:
+        await backfill_rollups_async()
+    except Exception as e:
+        logger.exception("Rollup backfill hatası: %s", e)
+
+async def _start_bot():
+    if BOT_UPDATE_MODE == "webhook" and not TELEGRAM_WEBHOOK_SECRET:
+        # Secret olmadan verify_secret her güncellemeyi 403 ile reddeder; webhook'u kaydetmek botu sessizce susturur
+        raise RuntimeError("BOT_UPDATE_MODE=webhook için TELEGRAM_WEBHOOK_SECRET ayarlanmalı.")
+    from app.bot import dp, get_bot, enable_in_process
+
+    app.state.bot_enabled = True
+    # Bot bu süreçte çalıştığı için sorguları HTTP yerine doğrudan servise yönlendir
+    enable_in_process()
+    if BOT_UPDATE_MODE == "webhook":
+        logger.info("Web API'si başlatıldı, Telegram güncellemeleri webhook ile alınacak...")
+        update_queue.start()
+        try:
+            await register_webhook()
+        except Exception as e:
+            logger.error("Telegram webhook kaydedilemedi: %s", e)
+        return
+    logger.info("Web API'si başlatıldı, Telegram Botu arka planda başlatılıyor...")
+    asyncio.create_task(dp.start_polling(get_bot()))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    for name in ("retention_task", "partition_task", "backfill_task", "quota_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await update_queue.stop()
+    await scheduler_engine.stop()
+    await notifier.stop()
+    await log_sink.stop()
+    if getattr(app.state, "bot_enabled", False):
+        from app.bot import close_api_client
+        await close_api_client()
+    await close_client()
 
 async def check_cron_secret(secret: Optional[str] = Query(None)):
     """Harici cron servisinin gizli şifreyi bilip bilmediğini kontrol eder."""
     if not CRON_SECRET:
-        print("UYARI: CRON_SECRET ayarlanmamış. Zamanlayıcı trigger'ı güvensiz.")
+        logger.warning("CRON_SECRET ayarlanmamış. Zamanlayıcı trigger'ı güvensiz.")
         return
     if secret != CRON_SECRET:
         raise HTTPException(status_code=403, detail="Geçersiz cron secret")
@@ -47,6 +128,49 @@ async def check_cron_secret(secret: Optional[str] = Query(None)):
 async def health():
     return {"ok": True}
 
+@app.post("/telegram/webhook")
+async def telegram_webhook(
+    request: Request,
+    secret_token: Optional[str] = Header(None, alias="X-Telegram-Bot-Api-Secret-Token"),
+):
+    """
+    Telegram güncellemelerini alır, kuyruğa koyar ve hemen cevap verir; işleme arka planda yapılır.
+    Kuyruk doluysa 503 döner, Telegram güncellemeyi daha sonra tekrar gönderir.
+    """
+    if BOT_UPDATE_MODE != "webhook":
+        raise HTTPException(status_code=404, detail="Webhook modu kapalı")
+    if not verify_secret(secret_token):
+        raise HTTPException(status_code=403, detail="Geçersiz secret token")
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz JSON")
+    if not isinstance(data, dict) or "update_id" not in data:
+        raise HTTPException(status_code=400, detail="Geçersiz Telegram güncellemesi")
+    if not update_queue.submit(data):
+        raise HTTPException(status_code=503, detail="Güncelleme kuyruğu dolu")
+    return {"ok": True}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrikleri. Anlık değerler (birikmiş görev, kuyruk boyutları) okuma anında hesaplanır."""
+    try:
+        SCHEDULER_DUE_BACKLOG.set(await count_due_jobs_async())
+    except Exception as e:
+        logger.error("Birikmiş görev sayısı okunamadı: %s", e)
+    for component, stats in (("log_sink", log_sink.stats()), ("notifier", notifier.stats()), ("webhook", update_queue.stats())):
+        for stat, value in stats.items():
+            COMPONENT_STATS.set(value, component=component, stat=stat)
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/v1/serpapi/status")
+async def get_serpapi_status(secret_check: None = Depends(check_cron_secret)):
+    """
+    Devre kesici durumu ve anahtar havuzu (anahtarların sadece son 4 hanesi gösterilir).
+    Tetikleyici gibi ?secret=CRON_SECRET ister.
+    """
+    return serpapi_status()
+
 # --- CRON JOB'UN ÇALACAĞI GİZLİ KAPI BURADA ---
 @app.get("/v1/trigger-scheduler")
 async def trigger_scheduler(secret_check: None = Depends(check_cron_secret)):
@@ -54,12 +178,12 @@ async def trigger_scheduler(secret_check: None = Depends(check_cron_secret)):
     Harici bir cron job servisi tarafından (örn: cron-job.org) tetiklenir.
     Zamanı gelmiş görevleri bir kez çalıştırır.
     """
-    print("Harici cron trigger'ı alındı, zamanlayıcı çalıştırılıyor...")
+    logger.info("Harici cron trigger'ı alındı, zamanlayıcı çalıştırılıyor...")
     try:
         asyncio.create_task(run_job_once())
         return {"status": "success", "message": "Zamanlayıcı tetiklendi, görevler arka planda işleniyor."}
     except Exception as e:
-        print(f"Harici cron trigger hatası: {e}")
+        logger.exception("Harici cron trigger hatası: %s", e)
         raise HTTPException(status_code=500, detail="Zamanlayıcıyı tetiklerken hata oluştu.")
 # --- BİTTİ ---
 
@@ -69,15 +193,41 @@ class CheckRequest(BaseModel):
     gl: str = DEFAULT_GL
     hl: str = DEFAULT_HL
     location: Optional[str] = None
+    max_age: Optional[int] = Field(None, ge=0, description="Önbellekteki sonucun kabul edilecek en fazla yaşı (saniye). 0 = önbelleği atla.")
+    strategy_mode: Optional[Literal["sequential", "parallel", "hedged"]] = None
+    hedge_delay_ms: Optional[int] = Field(None, ge=0)
 @app.post("/v1/check")
 async def check(req: CheckRequest):
+    # Sonuç zaten JSON'a uygun bir sözlük; yanıt doğrudan döndürülerek jsonable_encoder turu atlanır
     try:
-        res = await check_ads(req.query, gl=req.gl, hl=req.hl, device=req.device, location=req.location)
+        return ORJSONResponse(await run_check(req.query, gl=req.gl, hl=req.hl, device=req.device, location=req.location, max_age=req.max_age, strategy_mode=req.strategy_mode, hedge_delay_ms=req.hedge_delay_ms))
     except Exception as e:
         raise HTTPException(502, f"Upstream error: {e}")
-    entry = SearchLog(query=res["query"], has_ads=res["has_ads"], ads_count=res["ads_count"], types=",".join(res["types"]), device=res["device"], gl=res["gl"], hl=res["hl"], latency_ms=res["latency_ms"])
-    add_log(entry)
-    return res
+
+class BatchItem(BaseModel):
+    query: str = Field(..., min_length=1)
+    device: Literal["desktop", "mobile"] = "desktop"
+    location: Optional[str] = None
+class BatchCheckRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    gl: str = DEFAULT_GL
+    hl: str = DEFAULT_HL
+    max_age: Optional[int] = Field(None, ge=0)
+    concurrency: Optional[int] = Field(None, ge=1, description=f"En fazla {BATCH_CONCURRENCY}")
+@app.post("/v1/check/batch")
+async def check_batch(req: BatchCheckRequest):
+    """
+    Sorguları eşzamanlı çalıştırır ve her sonucu biter bitmez NDJSON satırı olarak gönderir.
+    Her satır: {"index", "query", "result", "error"} — hatalı öğe toplu işlemi durdurmaz.
+    """
+    concurrency = min(req.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    items = [item.model_dump() for item in req.items]
+
+    async def ndjson():
+        async for row in run_checks_stream(items, concurrency, gl=req.gl, hl=req.hl, max_age=req.max_age):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 class JobCreateRequest(BaseModel):
     query: str
@@ -85,29 +235,68 @@ class JobCreateRequest(BaseModel):
     location: Optional[str] = None
     device: Literal["desktop", "mobile"] = "desktop"
     telegram_user_id: Optional[str] = None
+    # True ise aralık min/max sınırları içinde reklam sonuçlarının oynaklığına göre ayarlanır
+    adaptive: bool = False
+    min_interval_minutes: Optional[int] = Field(None, ge=1)
+    max_interval_minutes: Optional[int] = Field(None, ge=1)
+    # "changes": sadece reklamverenler eklenince/çıkınca/yer değiştirince fark bildirimi gönderilir
+    notify_mode: Literal["always", "changes"] = "always"
 @app.post("/v1/jobs", response_model=ScheduledJob, status_code=201)
 async def create_job(req: JobCreateRequest):
+    if req.min_interval_minutes and req.max_interval_minutes and req.min_interval_minutes > req.max_interval_minutes:
+        raise HTTPException(status_code=422, detail="min_interval_minutes, max_interval_minutes'tan büyük olamaz.")
     job = ScheduledJob(
         query=req.query,
         interval_minutes=req.interval_minutes,
         location=req.location,
         device=req.device,
         telegram_user_id=req.telegram_user_id,
+        adaptive=req.adaptive,
+        min_interval_minutes=req.min_interval_minutes,
+        max_interval_minutes=req.max_interval_minutes,
+        notify_mode=req.notify_mode,
+        effective_interval_minutes=req.interval_minutes,
+        interval_reason="başlangıç aralığı",
         next_run_at=datetime.utcnow() + timedelta(minutes=req.interval_minutes)
     )
-    created_job = add_job(job)
+    created_job = await add_job_async(job)
+    scheduler_engine.schedule(created_job.id, created_job.next_run_at)
     return created_job
 
 @app.get("/v1/jobs", response_model=List[ScheduledJob])
 async def get_all_jobs():
-    return list_all_jobs()
+    return await list_all_jobs_async()
+@app.get("/v1/jobs/{job_id}/history")
+async def get_job_history(job_id: int, limit: int = Query(50, ge=1, le=1000)):
+    """Görevin reklam seti değişimleri (sadece değişen turlar saklanır), en yenisi önce."""
+    return await list_ad_history_async(job_id, limit)
+
 @app.delete("/v1/jobs/{job_id}", status_code=204)
 async def delete_job(job_id: int):
-    success = delete_job_by_id(job_id)
+    success = await delete_job_by_id_async(job_id)
     if not success:
         raise HTTPException(status_code=404, detail="Job not found")
+    scheduler_engine.unschedule(job_id)
     return
 
+@app.get("/v1/stats")
+async def get_stats(
+    granularity: Literal["hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    query: Optional[str] = None,
+    device: Optional[Literal["desktop", "mobile"]] = None,
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    Saatlik/günlük reklam görünürlüğü istatistikleri (ön-hesaplanmış rollup tablolarından).
+    start verilmezse son 30 gün döner.
+    """
+    if start is None:
+        start = datetime.utcnow() - timedelta(days=30)
+    rows = await query_stats_async(granularity=granularity, start=start, end=end, query=query, device=device, limit=limit)
+    return {"granularity": granularity, "start": start, "end": end, "rows": rows}
+
 @app.get("/", include_in_schema=False)
 async def read_index():
     return FileResponse(os.path.join(static_dir, 'index.html'))
\ No newline at end of file
@@ -0,0 +1,189 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Varsayılan gecikme kovaları (saniye)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: "Registry" = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Metrikler hem event loop'tan hem DB thread havuzundan güncellenir
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} için etiketler {self.labelnames} olmalı, verilen: {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """Değeri set() ile verilir veya her okumada `fn` çağrılarak hesaplanır."""
+    kind = "gauge"
+
+    def __init__(self, *args, fn: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._fn = fn
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _samples(self) -> List[str]:
+        if self._fn is not None:
+            return [f"{self.name} {_format_value(self._fn())}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler -> (kova sayaçları, toplam, adet)
+        self._values: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            if index < len(counts):
+                counts[index] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[Dict[str, str]]:
+        """
+        Bloğun süresini ölçer. Dönen sözlük üzerinden etiketler blok içinde değiştirilebilir
+        (örn. sonuca göre outcome). Blok hata verirse etiketler olduğu gibi kaydedilir.
+        """
+        labels = dict(labels)
+        t0 = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), t, n)) for k, (c, t, n) in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', _format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Prometheus text exposition formatı (0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- Uygulama metrikleri ---
+
+SERPAPI_ATTEMPT_SECONDS = Histogram(
+    "serpapi_attempt_seconds", "Tek bir arama stratejisi denemesinin süresi.", ["strategy", "outcome"])
+SERPAPI_REQUESTS = Counter(
+    "serpapi_requests_total", "SerpAPI'ye yapılan HTTP istekleri (sonuca göre).", ["status"])
+SERPAPI_ERRORS = Counter(
+    "serpapi_upstream_errors_total", "SerpAPI upstream hataları.", ["kind"])
+SERP_STRATEGY_FALLBACKS = Counter(
+    "serp_strategy_fallbacks_total", "İlk strateji yetmediği için yedek stratejiye geçiş sayısı.")
+CHECK_ADS_SECONDS = Histogram(
+    "check_ads_seconds", "check_ads çağrısının toplam süresi.", ["cached", "outcome"])
+SERP_CACHE_REQUESTS = Counter(
+    "serp_cache_requests_total", "SERP sonuç önbelleği istekleri.", ["result"])
+DB_OPERATION_SECONDS = Histogram(
+    "db_operation_seconds", "app/models.py veritabanı işlemlerinin süresi (thread havuzu bekleme hariç).",
+    ["operation", "outcome"])
+TELEGRAM_SEND_SECONDS = Histogram(
+    "telegram_send_seconds", "Telegram sendMessage çağrılarının süresi.", ["outcome"])
+SCHEDULER_TICK_SECONDS = Histogram(
+    "scheduler_tick_seconds", "Zamanlayıcı turunun süresi.", ["source"],
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+SCHEDULER_JOBS = Counter(
+    "scheduler_jobs_total", "Zamanlayıcının işlediği görevler.", ["result"])
+SCHEDULER_DUE_BACKLOG = Gauge(
+    "scheduler_due_jobs", "Zamanı gelmiş ama henüz çalıştırılmamış aktif görev sayısı (okuma anında).")
+COMPONENT_STATS = Gauge(
+    "component_stat", "Arka plan bileşenlerinin anlık sayaçları (log_sink, notifier, webhook kuyruğu).",
+    ["component", "stat"])
+STARTUP_PHASE_SECONDS = Gauge(
+    "startup_phase_seconds", "Son açılıştaki aşamaların süresi (import, şema, istemciler, bot...).", ["phase"])
@@ -1,10 +1,21 @@
 import os
+import json
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Optional, List, Dict, Any, Tuple
 from sqlmodel import SQLModel, Field, create_engine, Session, select
-from dotenv import load_dotenv
+from sqlalchemy import insert, update, delete, inspect, text, func, case, Index, UniqueConstraint, or_
+from sqlalchemy.exc import IntegrityError, OperationalError
 
-load_dotenv()
+from app.metrics import DB_OPERATION_SECONDS
+
+
+logger = logging.getLogger("app.models")
 
 # Render'ın PostgreSQL bağlantı URL'sini al
 db_url = os.getenv("DATABASE_URL")
@@ -12,14 +23,52 @@ if db_url and db_url.startswith("postgres://"):
     # SQLAlchemy'nin yeni sürümleri için 'postgres://' yerine 'postgresql://' gerekir
     db_url = db_url.replace("postgres://", "postgresql://", 1)
 
-if not db_url:
-    print("UYARI: DATABASE_URL bulunamadı. SQLite kullanılacak.")
-    db_url = "sqlite:///./data.db"
-    connect_args = {"check_same_thread": False}
-else:
-    connect_args = {}
+# Bağlantı havuzu ayarları (SQLite için havuz boyutu ayarları uygulanmaz)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Async katmanın kullandığı thread sayısı; varsayılan havuzun alabileceği en fazla bağlantı
+DB_THREADS = int(os.getenv("DB_THREADS", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+# Şema kurulumu (create_all + kolon ekleme) süreç başına bir kez yapılır; rollup backfill'i açılışı
+# bekletmeden arka planda çalışır. false: uygulama şemaya dokunmaz; dağıtım adımında
+# `python -m app.models` ile bir kez çalıştırılır.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+_engine = None
+_engine_lock = threading.Lock()
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+def get_engine():
+    """Engine (ve veritabanı sürücüsü) import anında değil ilk kullanımda oluşturulur."""
+    global _engine, db_url
+    if _engine is not None:
+        return _engine
+    with _engine_lock:
+        if _engine is None:
+            if not db_url:
+                logger.warning("DATABASE_URL bulunamadı. SQLite kullanılacak.")
+                db_url = "sqlite:///./data.db"
+                _engine = create_engine(db_url, connect_args={"check_same_thread": False})
+            else:
+                _engine = create_engine(
+                    db_url,
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_MAX_OVERFLOW,
+                    pool_pre_ping=DB_POOL_PRE_PING,
+                    pool_recycle=DB_POOL_RECYCLE,
+                )
+    return _engine
 
-engine = create_engine(db_url, connect_args=connect_args)
+# PostgreSQL'de SearchLog'u created_at'e göre aylık bölümlere (partition) ayırır. Sadece tablo
+# ilk kez oluşturulurken uygulanır; eski veriler bölüm ayırma/silme ile hızlıca atılabilir.
+LOG_PARTITIONING = os.getenv("LOG_PARTITIONING", "false").lower() in ("1", "true", "yes")
+LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", "2"))
+
+# Senkron Session çağrılarının event loop'u bloklamaması için ayrılmış thread havuzu
+_db_executor = ThreadPoolExecutor(max_workers=max(1, DB_THREADS), thread_name_prefix="db")
 
 class SearchLog(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -31,9 +80,45 @@ class SearchLog(SQLModel, table=True):
     gl: str
     hl: str
     latency_ms: int
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # Sonuç SERP önbelleğinden geldiyse True; bu satırlar rollup'lara sayılmaz
+    cached: Optional[bool] = None
+
+# --- Reklam görünürlüğü özetleri (rollup) ---
+# SearchLog satırları yazılırken aynı transaction'da artımlı olarak güncellenir;
+# /v1/stats ham log tablosunu taramadan bu tablolardan okur.
+class _AdStatsBase(SQLModel):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    bucket: datetime
+    query: str  # normalize edilmiş (küçük harf, tek boşluk)
+    device: str
+    checks: int = 0
+    with_ads: int = 0
+    ads_total: int = 0
+    latency_ms_total: int = 0
+
+class AdStatsHourly(_AdStatsBase, table=True):
+    __table_args__ = (
+        UniqueConstraint("bucket", "query", "device", name="uq_adstatshourly_bucket_query_device"),
+        Index("ix_adstatshourly_query_bucket", "query", "bucket"),
+    )
+
+class AdStatsDaily(_AdStatsBase, table=True):
+    __table_args__ = (
+        UniqueConstraint("bucket", "query", "device", name="uq_adstatsdaily_bucket_query_device"),
+        Index("ix_adstatsdaily_query_bucket", "query", "bucket"),
+    )
+
+class RollupState(SQLModel, table=True):
+    """Rollup tabloları eklenmeden önce yazılmış logların tek seferlik işlenme durumu."""
+    name: str = Field(primary_key=True)
+    cutoff_log_id: int = 0
+    last_log_id: int = 0
+    done: bool = False
 
 class ScheduledJob(SQLModel, table=True):
+    __table_args__ = (Index("ix_scheduledjob_active_next_run", "is_active", "next_run_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     query: str
     interval_minutes: int
@@ -43,50 +128,730 @@ class ScheduledJob(SQLModel, table=True):
     is_active: bool = Field(default=True)
     next_run_at: datetime = Field(default_factory=datetime.utcnow)
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Çoklu worker/node için kiralama: görevi o an çalıştıran worker ve kiranın bitiş zamanı
+    lease_owner: Optional[str] = None
+    lease_until: Optional[datetime] = None
+    # Uyarlanabilir mod: aralık min/max sınırları içinde son sonuçların oynaklığına göre ayarlanır
+    adaptive: Optional[bool] = False
+    min_interval_minutes: Optional[int] = None
+    max_interval_minutes: Optional[int] = None
+    # Son turda seçilen aralık ve gerekçesi (/v1/jobs'ta gösterilir)
+    effective_interval_minutes: Optional[int] = None
+    interval_reason: Optional[str] = None
+    # Son turlardaki reklam durumu ("1" reklam var, "0" yok), en yenisi sonda
+    ad_history: Optional[str] = None
+    # "always": reklam bulunan her turda bildirim; "changes": sadece reklamverenler değişince (farkla)
+    notify_mode: Optional[str] = "always"
+    # Son görülen reklam setinin parmak izi (içeriği AdSnapshot'ta)
+    ad_fingerprint: Optional[str] = None
+
+class UserPreference(SQLModel, table=True):
+    """Bot kullanıcısının /mobile ve /location ayarları; tüm worker ve replikalar arasında paylaşılır."""
+    user_id: str = Field(primary_key=True)
+    device: str = "desktop"
+    location: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class AdSnapshot(SQLModel, table=True):
+    """Bir reklam setinin içeriği; aynı set parmak iziyle tek kez saklanır."""
+    fingerprint: str = Field(primary_key=True)
+    # Sıralı [[domain, başlık], ...] JSON
+    ads: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class AdHistory(SQLModel, table=True):
+    """Görevin reklam seti değiştiğinde eklenen kayıt; değişmeyen turlar yazılmaz."""
+    __table_args__ = (Index("ix_adhistory_job_created", "job_id", "created_at"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int
+    fingerprint: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class CreditBudget(SQLModel, table=True):
+    """Günlük SERP kredi bütçesi için token kovası; cron süreçleri ve node'lar arasında paylaşılır."""
+    name: str = Field(primary_key=True)
+    tokens: float = 0.0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+# PostgreSQL'de bu tablolara sonradan eklenen indeksler açılışta (transaction içinde, yazmaları
+# kilitleyerek) kurulmaz; `python -m app.models` bunları CREATE INDEX CONCURRENTLY ile kurar.
+_CONCURRENT_INDEX_TABLES = ("searchlog",)
+
+def _upgrade_schema():
+    """
+    create_all mevcut tablolara dokunmaz; sonradan modele eklenen (nullable) kolonları
+    ve indeksleri mevcut veritabanına ekler.
+    """
+    inspector = inspect(get_engine())
+    postgres = get_engine().dialect.name == "postgresql"
+    deferred = []
+    with get_engine().begin() as conn:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for col in table.columns:
+                if col.name not in existing and col.nullable:
+                    col_type = col.type.compile(dialect=get_engine().dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}'))
+                    logger.info("Şema güncellendi: %s.%s eklendi.", table.name, col.name)
+            # Boş tabloda indeks kurmak anlıktır; dolu büyük tabloda CONCURRENTLY'ye bırakılır
+            defer = postgres and table.name in _CONCURRENT_INDEX_TABLES and \
+                conn.execute(text(f"SELECT 1 FROM {table.name} LIMIT 1")).first() is not None
+            for index in table.indexes:
+                if not defer:
+                    index.create(conn, checkfirst=True)
+                elif _index_valid(conn, index.name) is not True:
+                    deferred.append(index.name)
+    if deferred:
+        logger.warning("Eksik indeksler açılışta kurulmadı (%s); yazmaları kilitlemeden kurmak için "
+                       "`python -m app.models` çalıştırın.", ", ".join(deferred))
+
+def _index_valid(conn, name: str) -> Optional[bool]:
+    """İndeks yoksa None; varsa geçerli mi (yarıda kalan CONCURRENTLY kurulumu geçersiz indeks bırakır)."""
+    return conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:n)"), {"n": name}).scalar()
+
+def create_indexes_concurrently() -> None:
+    """
+    _CONCURRENT_INDEX_TABLES'taki eksik indeksleri CREATE INDEX CONCURRENTLY ile kurar (PostgreSQL).
+    CONCURRENTLY transaction içinde çalışmadığından autocommit bağlantı kullanılır. Bölümlü tabloda
+    indeks önce sadece ana tabloda (ON ONLY) açılır; her bölümünki eşzamanlı kurulup bağlanır.
+    """
+    if get_engine().dialect.name != "postgresql":
+        return
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for table_name in _CONCURRENT_INDEX_TABLES:
+            table = SQLModel.metadata.tables[table_name]
+            partitioned = _is_partitioned(conn, table_name)
+            for index in table.indexes:
+                if _index_valid(conn, index.name):
+                    continue
+                columns = ", ".join(col.name for col in index.columns)
+                unique = "UNIQUE " if index.unique else ""
+                if not partitioned:
+                    _create_index_concurrently(conn, index.name, table_name, columns, unique)
+                    logger.info("İndeks kuruldu: %s", index.name)
+                    continue
+                conn.execute(text(f"CREATE {unique}INDEX IF NOT EXISTS {index.name} ON ONLY {table_name} ({columns})"))
+                partitions = [row[0] for row in conn.execute(text(
+                    "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                    "WHERE i.inhparent = to_regclass(:t)"
+                ), {"t": table_name})]
+                for part in partitions:
+                    # Ana indeks açıldıktan sonra oluşturulan bölümler indeksi kendiliğinden alır
+                    attached = conn.execute(text(
+                        "SELECT 1 FROM pg_inherits i JOIN pg_index x ON x.indexrelid = i.inhrelid "
+                        "WHERE i.inhparent = to_regclass(:ix) AND x.indrelid = to_regclass(:p)"
+                    ), {"ix": index.name, "p": part}).first() is not None
+                    if attached:
+                        continue
+                    child = f"{part}_{index.name}"[:63]
+                    _create_index_concurrently(conn, child, part, columns, unique)
+                    conn.execute(text(f"ALTER INDEX {index.name} ATTACH PARTITION {child}"))
+                logger.info("İndeks kuruldu: %s (%d bölüm)", index.name, len(partitions))
+
+def _create_index_concurrently(conn, name: str, table: str, columns: str, unique: str = "") -> None:
+    if _index_valid(conn, name) is False:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY {name}"))
+    conn.execute(text(f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})"))
+
+def partitioning_enabled() -> bool:
+    return LOG_PARTITIONING and get_engine().dialect.name == "postgresql"
+
+def _is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :t"
+    ), {"t": table}).first() is not None
+
+def _create_partitioned_searchlog():
+    """SearchLog tablosunu (yoksa) created_at'e göre RANGE bölümlü olarak oluşturur."""
+    if not partitioning_enabled():
+        return
+    with get_engine().begin() as conn:
+        if inspect(conn).has_table("searchlog"):
+            if not _is_partitioned(conn, "searchlog"):
+                logger.warning("LOG_PARTITIONING açık ama mevcut searchlog tablosu bölümlü değil; "
+                               "dönüşüm elle yapılmalı. Saklama süresi satır silme ile uygulanacak.")
+            return
+        conn.execute(text("""
+            CREATE TABLE searchlog (
+                id BIGSERIAL,
+                query VARCHAR NOT NULL,
+                has_ads BOOLEAN NOT NULL,
+                ads_count INTEGER NOT NULL,
+                types VARCHAR NOT NULL,
+                device VARCHAR NOT NULL,
+                gl VARCHAR NOT NULL,
+                hl VARCHAR NOT NULL,
+                latency_ms INTEGER NOT NULL,
+                created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                cached BOOLEAN,
+                PRIMARY KEY (id, created_at)
+            ) PARTITION BY RANGE (created_at)
+        """))
+        # Hiçbir aylık bölüme düşmeyen satırlar için güvenlik ağı
+        conn.execute(text("CREATE TABLE searchlog_default PARTITION OF searchlog DEFAULT"))
+        logger.info("searchlog tablosu aylık bölümlü olarak oluşturuldu.")
+
+def month_start(d: datetime) -> datetime:
+    return datetime(d.year, d.month, 1)
+
+def next_month(d: datetime) -> datetime:
+    return datetime(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+def partition_name(month: datetime) -> str:
+    return f"searchlog_p{month:%Y%m}"
+
+def _create_month_partition(conn, month: datetime) -> None:
+    """
+    Ayın bölümünü (yoksa) oluşturur. DEFAULT bölümde bu aya düşmüş satır varsa PostgreSQL bölümü
+    eklemeyi reddeder; bu durumda DEFAULT ayrılır, satırlar yeni bölüme taşınır ve geri bağlanır.
+    """
+    name, upper = partition_name(month), next_month(month)
+    if conn.execute(text("SELECT to_regclass(:n)"), {"n": name}).scalar() is not None:
+        return
+    create = text(
+        f"CREATE TABLE {name} PARTITION OF searchlog "
+        f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    )
+    bounds = {"lo": month, "hi": upper}
+    has_default = conn.execute(text("SELECT to_regclass('searchlog_default')")).scalar() is not None
+    stranded = has_default and conn.execute(text(
+        "SELECT 1 FROM searchlog_default WHERE created_at >= :lo AND created_at < :hi LIMIT 1"
+    ), bounds).first() is not None
+    if not stranded:
+        conn.execute(create)
+        return
+    conn.execute(text("ALTER TABLE searchlog DETACH PARTITION searchlog_default"))
+    conn.execute(create)
+    moved = conn.execute(text(
+        "WITH moved AS (DELETE FROM searchlog_default WHERE created_at >= :lo AND created_at < :hi RETURNING *) "
+        "INSERT INTO searchlog SELECT * FROM moved"
+    ), bounds).rowcount
+    conn.execute(text("ALTER TABLE searchlog ATTACH PARTITION searchlog_default DEFAULT"))
+    logger.warning("%s oluşturuldu; DEFAULT bölümdeki %d satır taşındı.", name, moved)
+
+def ensure_searchlog_partitions(months_ahead: int = LOG_PARTITIONS_AHEAD) -> None:
+    """
+    Bu ay ve sonraki `months_ahead` ay için SearchLog bölümlerini oluşturur. Her ay ayrı
+    transaction'dadır; hata loglanır ve bir sonraki bakım turunda yeniden denenir.
+    """
+    if not partitioning_enabled():
+        return
+    with get_engine().connect() as conn:
+        if not _is_partitioned(conn, "searchlog"):
+            return
+    month = month_start(datetime.utcnow())
+    for _ in range(months_ahead + 1):
+        try:
+            with get_engine().begin() as conn:
+                _create_month_partition(conn, month)
+        except Exception as e:
+            logger.exception("searchlog bölümü oluşturulamadı (%s): %s", partition_name(month), e)
+        month = next_month(month)
+
+def init_db(force: bool = False):
+    """
+    Şemayı kurar/günceller; süreç başına bir kez çalışır, sonraki çağrılar hiçbir şey yapmaz.
+    DB_AUTO_MIGRATE=false iken sadece force=True ile (örn. `python -m app.models`) çalışır.
+    """
+    global _schema_ready
+    if _schema_ready or not (DB_AUTO_MIGRATE or force):
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        _create_partitioned_searchlog()
+        SQLModel.metadata.create_all(get_engine())
+        _upgrade_schema()
+        ensure_searchlog_partitions()
+        _init_rollup_state()
+        _schema_ready = True
 
-def init_db():
-    SQLModel.metadata.create_all(engine)
+def _init_rollup_state() -> None:
+    """
+    Rollup backfill'inin sınırını (o ana kadarki en büyük log id'si) kaydeder. Şema kurulumunda, bu süreç
+    log yazmaya başlamadan önce çalışır: sınırın üstündeki loglar rollup'lara yazılırken zaten işlenir,
+    altındakiler backfill_rollups ile. Kayıt varsa (başka bir worker/node oluşturduysa) dokunulmaz.
+    """
+    with Session(get_engine()) as session:
+        if session.get(RollupState, "searchlog") is not None:
+            return
+        cutoff = session.exec(select(func.max(SearchLog.id))).one() or 0
+        session.add(RollupState(name="searchlog", cutoff_log_id=cutoff, done=cutoff == 0))
+        try:
+            session.commit()
+        except IntegrityError:
+            # Başka bir worker aynı anda oluşturdu
+            session.rollback()
+
+def normalize_query(q: str) -> str:
+    """Sorgu/konum metnini karşılaştırma için normalize eder (küçük harf, tek boşluk). Önbellek anahtarları,
+    rollup'lar ve zamanlayıcı gruplaması bunu kullanır; hepsinin aynı kalması gerekir."""
+    return " ".join(q.split()).lower()
+
+def _aggregate_logs(rows: List[Dict[str, Any]]) -> Dict[type, List[Dict[str, Any]]]:
+    """
+    Log satırlarını saatlik ve günlük (bucket, query, device) kovalarına toplar. Önbellekten dönen
+    sonuçlar yeni bir SerpAPI kontrolü olmadığından (gecikmesi ~0) sayılmaz.
+    """
+    buckets: Dict[type, Dict[tuple, Dict[str, Any]]] = {AdStatsHourly: {}, AdStatsDaily: {}}
+    for row in rows:
+        if row.get("cached"):
+            continue
+        created_at = row["created_at"]
+        hour = created_at.replace(minute=0, second=0, microsecond=0)
+        day = hour.replace(hour=0)
+        query = normalize_query(row["query"])
+        for model, bucket in ((AdStatsHourly, hour), (AdStatsDaily, day)):
+            key = (bucket, query, row["device"])
+            agg = buckets[model].get(key)
+            if agg is None:
+                agg = buckets[model][key] = {"bucket": bucket, "query": query, "device": row["device"],
+                                             "checks": 0, "with_ads": 0, "ads_total": 0, "latency_ms_total": 0}
+            agg["checks"] += 1
+            agg["with_ads"] += 1 if row["has_ads"] else 0
+            agg["ads_total"] += row["ads_count"]
+            agg["latency_ms_total"] += row["latency_ms"]
+    # Sabit sıra: eşzamanlı upsert'lerde satır kilitleri hep aynı sırada alınır
+    return {model: [values[key] for key in sorted(values)] for model, values in buckets.items()}
+
+_ROLLUP_COUNTERS = ("checks", "with_ads", "ads_total", "latency_ms_total")
+
+def _dialect_insert(model):
+    """
+    ON CONFLICT destekleyen INSERT ifadesi (PostgreSQL/SQLite). Diğer veritabanlarında None döner;
+    çağıran oku-yaz yoluna düşer.
+    """
+    name = get_engine().dialect.name
+    if name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert(model)
+
+def _upsert_rollups(session: Session, rows: List[Dict[str, Any]]) -> None:
+    """Rollup satırlarını sayaçları artırarak ekler (INSERT ... ON CONFLICT DO UPDATE)."""
+    for model, aggregates in _aggregate_logs(rows).items():
+        if not aggregates:
+            continue
+        stmt = _dialect_insert(model)
+        if stmt is not None:
+            stmt = stmt.values(aggregates)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["bucket", "query", "device"],
+                set_={col: getattr(model, col) + getattr(stmt.excluded, col) for col in _ROLLUP_COUNTERS},
+            )
+            session.execute(stmt)
+            continue
+        for agg in aggregates:
+            existing = session.exec(select(model).where(
+                model.bucket == agg["bucket"], model.query == agg["query"], model.device == agg["device"])).first()
+            if existing is None:
+                session.add(model(**agg))
+            else:
+                for col in _ROLLUP_COUNTERS:
+                    setattr(existing, col, getattr(existing, col) + agg[col])
+                session.add(existing)
 
 def add_log(entry: "SearchLog") -> None:
-    with Session(engine) as session:
-        session.add(entry)
+    add_logs([entry.model_dump(exclude={"id"})])
+
+def add_logs(rows: List[Dict[str, Any]]) -> None:
+    """
+    Birden çok SearchLog satırını tek transaction'da, çok satırlı INSERT ile yazar.
+    Saatlik/günlük rollup'lar aynı transaction'da güncellenir.
+    """
+    if not rows:
+        return
+    with Session(get_engine()) as session:
+        session.execute(insert(SearchLog), rows)
+        _upsert_rollups(session, rows)
         session.commit()
 
+ROLLUP_BACKFILL_CHUNK = int(os.getenv("ROLLUP_BACKFILL_CHUNK", "5000"))
+
+def backfill_rollups(chunk_size: int = ROLLUP_BACKFILL_CHUNK) -> None:
+    """
+    Rollup tabloları eklenmeden önce yazılmış logları (init_db'nin kaydettiği sınıra kadar) parça parça
+    işler. Sadece bir kez çalışır; yarıda kalırsa kaldığı yerden devam eder. Her parça, ilerleme kaydıyla
+    aynı transaction'da yazılır.
+    """
+    while True:
+        with Session(get_engine()) as session:
+            stmt = select(RollupState).where(RollupState.name == "searchlog")
+            if get_engine().dialect.name == "postgresql":
+                stmt = stmt.with_for_update()
+            state = session.exec(stmt).first()
+            if state is None:
+                logger.warning("Rollup backfill sınırı yok; önce init_db (veya `python -m app.models`) çalışmalı.")
+                return
+            if state.done:
+                return
+            logs = list(session.exec(
+                select(SearchLog)
+                .where(SearchLog.id > state.last_log_id, SearchLog.id <= state.cutoff_log_id)
+                .order_by(SearchLog.id)
+                .limit(chunk_size)
+            ))
+            if logs:
+                _upsert_rollups(session, [log.model_dump() for log in logs])
+                state.last_log_id = logs[-1].id
+            if len(logs) < chunk_size:
+                state.done = True
+                logger.info("Rollup geçmişi işlendi (%d log).", state.cutoff_log_id)
+            session.add(state)
+            session.commit()
+
+def query_stats(granularity: str = "day", start: Optional[datetime] = None, end: Optional[datetime] = None,
+                query: Optional[str] = None, device: Optional[str] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+    """Rollup tablolarından reklam görünürlüğü istatistikleri döner (bucket'a göre yeniden eskiye)."""
+    model = AdStatsHourly if granularity == "hour" else AdStatsDaily
+    stmt = select(model)
+    if start is not None:
+        stmt = stmt.where(model.bucket >= start)
+    if end is not None:
+        stmt = stmt.where(model.bucket < end)
+    if query:
+        stmt = stmt.where(model.query == normalize_query(query))
+    if device:
+        stmt = stmt.where(model.device == device)
+    stmt = stmt.order_by(model.bucket.desc(), model.query, model.device).limit(limit)
+    with Session(get_engine()) as session:
+        rows = list(session.exec(stmt))
+    return [
+        {
+            "bucket": row.bucket,
+            "query": row.query,
+            "device": row.device,
+            "checks": row.checks,
+            "with_ads": row.with_ads,
+            "ad_rate": round(row.with_ads / row.checks, 4) if row.checks else 0.0,
+            "avg_ads": round(row.ads_total / row.checks, 2) if row.checks else 0.0,
+            "avg_latency_ms": int(row.latency_ms_total / row.checks) if row.checks else 0,
+        }
+        for row in rows
+    ]
+
 def list_logs(limit: int = 50) -> List["SearchLog"]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         stmt = select(SearchLog).order_by(SearchLog.id.desc()).limit(limit)
         return list(session.exec(stmt))
 
 def add_job(job: "ScheduledJob") -> "ScheduledJob":
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         session.add(job)
         session.commit()
         session.refresh(job)
         return job
 
 def list_all_jobs() -> List["ScheduledJob"]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         return list(session.exec(select(ScheduledJob).order_by(ScheduledJob.id.desc())))
 
 def delete_job_by_id(job_id: int):
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         job = session.get(ScheduledJob, job_id)
         if job:
             session.delete(job)
+            session.execute(delete(AdHistory).where(AdHistory.job_id == job_id))
             session.commit()
             return True
         return False
 
+def list_active_jobs() -> List["ScheduledJob"]:
+    with Session(get_engine()) as session:
+        return list(session.exec(select(ScheduledJob).where(ScheduledJob.is_active == True)))
+
+def get_jobs_by_ids(job_ids: List[int]) -> List["ScheduledJob"]:
+    if not job_ids:
+        return []
+    with Session(get_engine()) as session:
+        return list(session.exec(select(ScheduledJob).where(ScheduledJob.id.in_(job_ids))))
+
 def get_due_jobs() -> List["ScheduledJob"]:
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         now = datetime.utcnow()
         stmt = select(ScheduledJob).where(ScheduledJob.next_run_at <= now, ScheduledJob.is_active == True)
         return list(session.exec(stmt))
 
+def count_due_jobs() -> int:
+    """Zamanı gelmiş, kiralanmamış aktif görev sayısı (zamanlayıcının birikmiş işi)."""
+    now = datetime.utcnow()
+    with Session(get_engine()) as session:
+        stmt = select(func.count()).select_from(ScheduledJob).where(
+            ScheduledJob.is_active == True,
+            ScheduledJob.next_run_at <= now,
+            or_(ScheduledJob.lease_until == None, ScheduledJob.lease_until < now),
+        )
+        return session.exec(stmt).one()
+
+def claim_due_jobs(owner: str, limit: int = 500, lease_seconds: int = 300, job_ids: Optional[List[int]] = None) -> List["ScheduledJob"]:
+    """
+    Zamanı gelmiş aktif görevlerden en fazla `limit` tanesini atomik olarak `owner` adına kiralar.
+    Başka bir worker'ın geçerli kirasındaki görevler alınmaz. job_ids verilirse sadece onlar denenir.
+    PostgreSQL'de aday satırlar FOR UPDATE SKIP LOCKED ile seçilir; SQLite yazmaları zaten
+    serileştirdiği için UPDATE'in kendi WHERE koşulu yeterlidir.
+    """
+    now = datetime.utcnow()
+    claimable = (
+        ScheduledJob.is_active == True,
+        ScheduledJob.next_run_at <= now,
+        or_(ScheduledJob.lease_until == None, ScheduledJob.lease_until < now),
+    )
+    candidates = select(ScheduledJob.id).where(*claimable).order_by(ScheduledJob.next_run_at).limit(limit)
+    if job_ids is not None:
+        if not job_ids:
+            return []
+        candidates = candidates.where(ScheduledJob.id.in_(job_ids))
+    if get_engine().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    with Session(get_engine()) as session:
+        claimed_ids = list(session.exec(candidates))
+        if not claimed_ids:
+            session.rollback()
+            return []
+        stmt = (
+            update(ScheduledJob)
+            .where(ScheduledJob.id.in_(claimed_ids), *claimable)
+            .values(lease_owner=owner, lease_until=now + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(stmt)
+        session.commit()
+        # next_run_at sırası run_jobs'ta bütçe önceliği için kullanılır (en uzun bekleyen önce)
+        stmt = (
+            select(ScheduledJob)
+            .where(ScheduledJob.id.in_(claimed_ids), ScheduledJob.lease_owner == owner)
+            .order_by(ScheduledJob.next_run_at, ScheduledJob.id)
+        )
+        return list(session.exec(stmt))
+
+def complete_jobs(owner: str, jobs: List["ScheduledJob"]) -> None:
+    """
+    Kiralanan görevlerin next_run_at ve aralık bilgilerini tek bir toplu UPDATE ile yazar ve kirayı bırakır.
+    Zamanlayıcı next_run_at'i ilerletmediyse (örn. tur yarıda kaldıysa) interval_minutes kadar ileri alınır.
+    """
+    if not jobs:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": job.id,
+            "next_run_at": job.next_run_at if job.next_run_at > now else now + timedelta(minutes=job.interval_minutes),
+            "effective_interval_minutes": job.effective_interval_minutes,
+            "interval_reason": job.interval_reason,
+            "ad_history": job.ad_history,
+            "ad_fingerprint": job.ad_fingerprint,
+            "lease_owner": None,
+            "lease_until": None,
+        }
+        for job in jobs
+    ]
+    with Session(get_engine()) as session:
+        # Kira başka bir worker'a geçtiyse (süre aşımı) onun kaydına dokunma
+        session.execute(
+            update(ScheduledJob).where(or_(ScheduledJob.lease_owner == owner, ScheduledJob.lease_owner == None)),
+            rows,
+            execution_options={"synchronize_session": False},
+        )
+        session.commit()
+
+def get_user_pref(user_id: str) -> Optional[Dict[str, Any]]:
+    with Session(get_engine()) as session:
+        pref = session.get(UserPreference, user_id)
+        return {"device": pref.device, "location": pref.location} if pref else None
+
+def save_user_pref(user_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Sadece verilen alanları günceller (yoksa satırı oluşturur) ve kullanıcının güncel ayarlarını döner."""
+    now = datetime.utcnow()
+    with Session(get_engine()) as session:
+        stmt = _dialect_insert(UserPreference)
+        if stmt is not None:
+            stmt = stmt.values(user_id=user_id, updated_at=now, **fields)
+            stmt = stmt.on_conflict_do_update(index_elements=["user_id"], set_={**fields, "updated_at": now})
+            session.execute(stmt)
+        else:
+            pref = session.get(UserPreference, user_id) or UserPreference(user_id=user_id)
+            for key, value in fields.items():
+                setattr(pref, key, value)
+            pref.updated_at = now
+            session.add(pref)
+        session.commit()
+        pref = session.get(UserPreference, user_id)
+        return {"device": pref.device, "location": pref.location}
+
+def get_ad_snapshots(fingerprints: List[str]) -> Dict[str, str]:
+    """Parmak izi -> reklam seti JSON'u."""
+    if not fingerprints:
+        return {}
+    with Session(get_engine()) as session:
+        rows = session.exec(select(AdSnapshot).where(AdSnapshot.fingerprint.in_(fingerprints)))
+        return {row.fingerprint: row.ads for row in rows}
+
+def record_ad_changes(snapshots: Dict[str, str], history: List[Dict[str, Any]]) -> None:
+    """
+    Yeni reklam setlerini (zaten kayıtlıysa atlanır) ve görev geçmişi satırlarını tek transaction'da yazar.
+    history satırları: {"job_id", "fingerprint", "created_at"}
+    """
+    if not snapshots and not history:
+        return
+    with Session(get_engine()) as session:
+        if snapshots:
+            existing = set(session.exec(select(AdSnapshot.fingerprint).where(AdSnapshot.fingerprint.in_(list(snapshots)))))
+            now = datetime.utcnow()
+            rows = [{"fingerprint": fp, "ads": ads, "created_at": now} for fp, ads in snapshots.items() if fp not in existing]
+            if rows:
+                # Aynı yeni seti eşzamanlı gören başka bir grup önce yazmış olabilir; çakışma geçmişi kaybettirmesin
+                stmt = _dialect_insert(AdSnapshot)
+                if stmt is not None:
+                    session.execute(stmt.values(rows).on_conflict_do_nothing())
+                else:
+                    session.execute(insert(AdSnapshot), rows)
+        if history:
+            session.execute(insert(AdHistory), history)
+        session.commit()
+
+def list_ad_history(job_id: int, limit: int = 50) -> List[Dict[str, Any]]:
+    """Görevin reklam seti değişimleri, en yenisi önce."""
+    with Session(get_engine()) as session:
+        stmt = (
+            select(AdHistory.created_at, AdHistory.fingerprint, AdSnapshot.ads)
+            .join(AdSnapshot, AdSnapshot.fingerprint == AdHistory.fingerprint)
+            .where(AdHistory.job_id == job_id)
+            .order_by(AdHistory.created_at.desc(), AdHistory.id.desc())
+            .limit(limit)
+        )
+        return [{"seen_at": created_at, "fingerprint": fp, "ads": json.loads(ads)} for created_at, fp, ads in session.exec(stmt)]
+
+BUDGET_DB_RETRIES = 5
+
+def take_budget_tokens(name: str, requested: int, daily_budget: int, burst: int) -> Tuple[int, float]:
+    """
+    `name` kovasından en fazla `requested` token alır. Kova saniyede daily_budget/86400 token dolar,
+    en fazla `burst` token birikir. Dönüş: (verilen token, kovada kalan token).
+    Yeni değer, okunan değer hâlâ aynıysa yazılır (tek koşullu UPDATE); araya başka bir süreç/node
+    girdiyse okuma tekrarlanır. Böylece kova her veritabanında kilit gerektirmeden paylaşılır.
+    """
+    rate = daily_budget / 86400
+    for attempt in range(BUDGET_DB_RETRIES):
+        try:
+            with Session(get_engine()) as session:
+                bucket = session.exec(select(CreditBudget).where(CreditBudget.name == name)).first()
+                now = datetime.utcnow()
+                if bucket is None:
+                    granted = max(0, min(requested, burst))
+                    session.add(CreditBudget(name=name, tokens=float(burst - granted), updated_at=now))
+                    session.commit()
+                    return granted, float(burst - granted)
+                elapsed = max(0.0, (now - bucket.updated_at).total_seconds())
+                tokens = min(float(burst), bucket.tokens + elapsed * rate)
+                granted = max(0, min(requested, int(tokens)))
+                swapped = session.execute(
+                    update(CreditBudget)
+                    .where(CreditBudget.name == name, CreditBudget.tokens == bucket.tokens,
+                           CreditBudget.updated_at == bucket.updated_at)
+                    .values(tokens=tokens - granted, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                session.commit()
+                if swapped:
+                    return granted, tokens - granted
+        except (IntegrityError, OperationalError):
+            # İlk satırı aynı anda başka bir node oluşturdu ya da veritabanı kilitli (SQLite); tekrar dene
+            if attempt == BUDGET_DB_RETRIES - 1:
+                raise
+        time.sleep(0.02 * (attempt + 1))
+    raise RuntimeError(f"Kredi kovası güncellenemedi ({name}): eşzamanlı güncellemeler çakıştı.")
+
+def refund_budget_tokens(name: str, amount: float, burst: int) -> None:
+    """
+    Kullanılmayan tokenları kovaya geri koyar (negatif `amount` ek harcama olarak düşülür); kova `burst`'ü
+    aşmaz. Tek atomik UPDATE'tir, okuma yapmaz.
+    """
+    if not amount:
+        return
+    tokens = CreditBudget.tokens + amount
+    for attempt in range(BUDGET_DB_RETRIES):
+        try:
+            with Session(get_engine()) as session:
+                session.execute(
+                    update(CreditBudget)
+                    .where(CreditBudget.name == name)
+                    .values(tokens=case((tokens > burst, float(burst)), else_=tokens))
+                    .execution_options(synchronize_session=False)
+                )
+                session.commit()
+                return
+        except OperationalError:
+            if attempt == BUDGET_DB_RETRIES - 1:
+                raise
+        time.sleep(0.02 * (attempt + 1))
+
 def update_job_next_run(job_id: int, interval_minutes: int):
-    with Session(engine) as session:
+    with Session(get_engine()) as session:
         job = session.get(ScheduledJob, job_id)
         if job:
             job.next_run_at = datetime.utcnow() + timedelta(minutes=interval_minutes)
             session.add(job)
-            session.commit()
\ No newline at end of file
+            session.commit()
+
+# --- Async erişim katmanı ---
+# Aşağıdaki fonksiyonlar senkron API'nin aynısıdır, ancak DB thread havuzunda çalışır.
+# async handler'lar ve zamanlayıcı bunları kullanır; script'ler senkron API'yi kullanmaya devam edebilir.
+
+def _timed(fn, *args, **kwargs):
+    # Süre thread içinde ölçülür; havuzda bekleme süresi DB işlemine sayılmaz
+    with DB_OPERATION_SECONDS.time(operation=getattr(fn, "__name__", "unknown"), outcome="error") as labels:
+        result = fn(*args, **kwargs)
+        labels["outcome"] = "ok"
+        return result
+
+async def run_db(fn, *args, **kwargs):
+    """Senkron bir veritabanı fonksiyonunu DB thread havuzunda çalıştırır."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(_timed, fn, *args, **kwargs))
+
+def _to_async(fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_db(fn, *args, **kwargs)
+    return wrapper
+
+init_db_async = _to_async(init_db)
+backfill_rollups_async = _to_async(backfill_rollups)
+add_log_async = _to_async(add_log)
+add_logs_async = _to_async(add_logs)
+list_logs_async = _to_async(list_logs)
+query_stats_async = _to_async(query_stats)
+add_job_async = _to_async(add_job)
+list_all_jobs_async = _to_async(list_all_jobs)
+delete_job_by_id_async = _to_async(delete_job_by_id)
+list_active_jobs_async = _to_async(list_active_jobs)
+get_jobs_by_ids_async = _to_async(get_jobs_by_ids)
+get_due_jobs_async = _to_async(get_due_jobs)
+count_due_jobs_async = _to_async(count_due_jobs)
+update_job_next_run_async = _to_async(update_job_next_run)
+claim_due_jobs_async = _to_async(claim_due_jobs)
+complete_jobs_async = _to_async(complete_jobs)
+take_budget_tokens_async = _to_async(take_budget_tokens)
+refund_budget_tokens_async = _to_async(refund_budget_tokens)
+get_ad_snapshots_async = _to_async(get_ad_snapshots)
+get_user_pref_async = _to_async(get_user_pref)
+save_user_pref_async = _to_async(save_user_pref)
+record_ad_changes_async = _to_async(record_ad_changes)
+list_ad_history_async = _to_async(list_ad_history)
+
+if __name__ == "__main__":
+    # Dağıtım adımı: şemayı bir kez kur/güncelle (DB_AUTO_MIGRATE=false ile birlikte kullanılır)
+    from app.logs import setup_logging
+
+    setup_logging()
+    init_db(force=True)
+    create_indexes_concurrently()
+    backfill_rollups()
+    logger.info("Veritabanı şeması hazır.")
@@ -0,0 +1,297 @@
+import os
+import time
+import asyncio
+import logging
+import httpx
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from app.metrics import TELEGRAM_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+
+# Telegram limitleri: toplamda ~30 mesaj/sn, aynı sohbete ~1 mesaj/sn, gruplara ~20 mesaj/dk
+NOTIFY_GLOBAL_RATE = float(os.getenv("NOTIFY_GLOBAL_RATE", "25"))
+NOTIFY_CHAT_RATE = float(os.getenv("NOTIFY_CHAT_RATE", "1"))
+NOTIFY_GROUP_RATE_PER_MIN = float(os.getenv("NOTIFY_GROUP_RATE_PER_MIN", "20"))
+# Aynı sohbete bu süre içinde gelen uyarılar tek mesajda birleştirilir
+NOTIFY_MERGE_WINDOW_MS = int(os.getenv("NOTIFY_MERGE_WINDOW_MS", "2000"))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", "5"))
+NOTIFY_QUEUE_MAX = int(os.getenv("NOTIFY_QUEUE_MAX", "10000"))
+NOTIFY_SHUTDOWN_TIMEOUT = float(os.getenv("NOTIFY_SHUTDOWN_TIMEOUT", "10"))
+
+# Telegram tek mesaj sınırı
+MAX_MESSAGE_LENGTH = 4096
+MERGE_SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+
+
+class RateLimiter:
+    """Çağrıları eşit aralıklara yayan basit hız sınırlayıcı (saniyede `rate` çağrı)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+
+    def reserve(self) -> float:
+        """Sıradaki slotu ayırır ve o slota kalan süreyi (saniye) döner; beklemez."""
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        return slot - now
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def penalize(self, seconds: float):
+        """429 retry_after gibi durumlarda sonraki çağrıyı en az `seconds` sonraya erteler."""
+        self._next = max(self._next, time.monotonic() + seconds)
+
+
+def _is_group(chat_id: str) -> bool:
+    return str(chat_id).startswith("-")
+
+
+def _merge_messages(texts: List[str]) -> List[str]:
+    """Mesajları Telegram sınırını aşmayacak şekilde birleştirir."""
+    merged: List[str] = []
+    current = ""
+    for text in texts:
+        text = text[:MAX_MESSAGE_LENGTH]
+        candidate = current + MERGE_SEPARATOR + text if current else text
+        if len(candidate) > MAX_MESSAGE_LENGTH:
+            merged.append(current)
+            current = text
+        else:
+            current = candidate
+    if current:
+        merged.append(current)
+    return merged
+
+
+class TelegramNotifier:
+    """
+    Telegram'a giden bildirimler için async kuyruk. Aynı sohbete kısa süre içinde gelen uyarıları
+    birleştirir, global ve sohbet bazlı hız limitlerini uygular, 429'da retry_after kadar bekleyip tekrar dener.
+
+    Mesajlar sohbet başına kuyruklarda tutulur. Bir sohbet, hız sınırlayıcısının izin verdiği ana kadar
+    zamanlayıcıda bekler ve ancak o an worker'lara verilir; böylece limitte bekleyen (örn. grup) sohbetler
+    worker'ları meşgul edip diğer sohbetlere gidecek mesajları geciktirmez.
+    """
+
+    def __init__(self, token: Optional[str] = TELEGRAM_BOT_TOKEN):
+        self.token = token
+        self.sent = 0
+        self.failed = 0
+        self._global_limiter = RateLimiter(NOTIFY_GLOBAL_RATE)
+        self._chat_limiters: Dict[str, RateLimiter] = {}
+        self._buffers: Dict[str, List[str]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        # Sohbet başına gönderilmeyi bekleyen (metin, deneme) kayıtları
+        self._pending: Dict[str, Deque[Tuple[str, int]]] = {}
+        self._pending_count = 0
+        # Zamanlayıcıda bekleyen, hazır kuyruğunda olan veya o an gönderilen sohbetler
+        self._active: Set[str] = set()
+        self._ready_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._workers: List[asyncio.Task] = []
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self):
+        if self.running:
+            return
+        self._ready = asyncio.Queue()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10, connect=5),
+            limits=httpx.Limits(max_connections=max(1, NOTIFY_WORKERS), max_keepalive_connections=max(1, NOTIFY_WORKERS)),
+        )
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, NOTIFY_WORKERS))]
+
+    async def stop(self):
+        """Birleştirme tamponlarını boşaltır, kuyruktaki mesajların gönderilmesini bekler ve kapanır."""
+        if not self.running:
+            return
+        for chat_id in list(self._buffers):
+            self._flush_chat(chat_id)
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=NOTIFY_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("%d bildirim kapanışta gönderilemedi.", self._pending_count)
+        for handle in self._ready_timers.values():
+            handle.cancel()
+        self._ready_timers.clear()
+        self._active.clear()
+        self._pending.clear()
+        self._pending_count = 0
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._client.aclose()
+        self._client = None
+
+    def notify(self, chat_id: str, text: str):
+        """Bildirimi kuyruğa ekler; gönderim arka planda yapılır."""
+        if not self.token:
+            logger.error("TELEGRAM_BOT_TOKEN yok, bildirim gönderilemedi: %s", chat_id)
+            return
+        if not self.running:
+            self.start()
+        chat_id = str(chat_id)
+        self._buffers.setdefault(chat_id, []).append(text)
+        if chat_id not in self._flush_handles:
+            loop = asyncio.get_running_loop()
+            self._flush_handles[chat_id] = loop.call_later(NOTIFY_MERGE_WINDOW_MS / 1000, self._flush_chat, chat_id)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._pending_count,
+            "buffered": sum(len(v) for v in self._buffers.values()),
+            "sent": self.sent,
+            "failed": self.failed,
+        }
+
+    def _flush_chat(self, chat_id: str):
+        handle = self._flush_handles.pop(chat_id, None)
+        if handle is not None:
+            handle.cancel()
+        texts = self._buffers.pop(chat_id, [])
+        if len(texts) > 1:
+            logger.info("%d uyarı tek mesajda birleştirildi: %s", len(texts), chat_id)
+        for message in _merge_messages(texts):
+            if not self._enqueue(chat_id, message, 0):
+                self.failed += 1
+                logger.error("Bildirim kuyruğu dolu, mesaj atıldı: %s", chat_id)
+
+    def _enqueue(self, chat_id: str, text: str, attempt: int, front: bool = False) -> bool:
+        if self._pending_count >= NOTIFY_QUEUE_MAX:
+            return False
+        queue = self._pending.setdefault(chat_id, deque())
+        if front:
+            queue.appendleft((text, attempt))
+        else:
+            queue.append((text, attempt))
+        self._pending_count += 1
+        self._idle.clear()
+        if chat_id not in self._active:
+            self._schedule(chat_id)
+        return True
+
+    def _schedule(self, chat_id: str):
+        """Sohbeti, sohbet limitinin izin verdiği ilk anda worker'lara verilmek üzere zamanlar."""
+        self._active.add(chat_id)
+        delay = self._chat_limiter(chat_id).reserve()
+        if delay <= 0:
+            self._ready.put_nowait(chat_id)
+        else:
+            loop = asyncio.get_running_loop()
+            self._ready_timers[chat_id] = loop.call_later(delay, self._make_ready, chat_id)
+
+    def _make_ready(self, chat_id: str):
+        self._ready_timers.pop(chat_id, None)
+        self._ready.put_nowait(chat_id)
+
+    def _chat_limiter(self, chat_id: str) -> RateLimiter:
+        limiter = self._chat_limiters.get(chat_id)
+        if limiter is None:
+            rate = NOTIFY_GROUP_RATE_PER_MIN / 60 if _is_group(chat_id) else NOTIFY_CHAT_RATE
+            limiter = self._chat_limiters[chat_id] = RateLimiter(rate)
+        return limiter
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            queue = self._pending.get(chat_id)
+            if not queue:
+                self._active.discard(chat_id)
+                continue
+            text, attempt = queue.popleft()
+            self._pending_count -= 1
+            try:
+                await self._deliver(chat_id, text, attempt)
+            except Exception as e:
+                self.failed += 1
+                logger.exception("Bildirim gönderilemedi: %s, Hata: %s", chat_id, e)
+            finally:
+                # Sohbetin sıradaki mesajı (veya tekrar denemesi) bir sonraki slotuna zamanlanır
+                self._active.discard(chat_id)
+                if queue:
+                    self._schedule(chat_id)
+                else:
+                    self._pending.pop(chat_id, None)
+                if not self._pending_count and not self._active:
+                    self._idle.set()
+
+    async def _deliver(self, chat_id: str, text: str, attempt: int):
+        # Sohbet limiti zamanlamada uygulandı; burada sadece global limit beklenir
+        limiter = self._chat_limiter(chat_id)
+        await self._global_limiter.acquire()
+
+        retry_after: Optional[float] = None
+        flood_wait = False
+        try:
+            ok, retry_after, error, flood_wait = await self._send(chat_id, text)
+        except httpx.HTTPError as e:
+            ok, error = False, str(e)
+            retry_after = min(2 ** attempt, 30)
+
+        if ok:
+            self.sent += 1
+            logger.info("Bildirim başarıyla gönderildi: %s", chat_id)
+            return
+        if retry_after is None or attempt >= NOTIFY_MAX_RETRIES:
+            self.failed += 1
+            logger.error("Bildirim gönderilemedi: %s, Hata: %s", chat_id, error)
+            return
+
+        logger.warning("Telegram %.0f sn beklememizi istedi, tekrar denenecek: %s", retry_after, chat_id)
+        limiter.penalize(retry_after)
+        if flood_wait:
+            # 429 bekleme süresi Telegram'da tüm bot için geçerli; diğer sohbetler de beklemeli
+            self._global_limiter.penalize(retry_after)
+        # Gecikmeli tekrar: sohbet kuyruğunun başına geri koy; sohbet retry_after sonrasına zamanlanır
+        if not self._enqueue(chat_id, text, attempt + 1, front=True):
+            self.failed += 1
+            logger.error("Bildirim kuyruğu dolu, tekrar deneme atıldı: %s", chat_id)
+
+    async def _send(self, chat_id: str, text: str) -> Tuple[bool, Optional[float], str, bool]:
+        """
+        (başarılı, retry_after_saniye, hata, flood_wait) döner. retry_after None ise tekrar denenmez;
+        flood_wait Telegram'ın 429 ile tüm bota bekleme süresi verdiğini belirtir.
+        """
+        url = f"{TELEGRAM_API_BASE}/bot{self.token}/sendMessage"
+        payload = {"chat_id": chat_id, "text": text, "disable_web_page_preview": True}
+        with TELEGRAM_SEND_SECONDS.time(outcome="transport_error") as labels:
+            r = await self._client.post(url, json=payload)
+            if r.status_code == 200:
+                labels["outcome"] = "ok"
+            elif r.status_code == 429:
+                labels["outcome"] = "rate_limited"
+            else:
+                labels["outcome"] = "server_error" if r.status_code >= 500 else "client_error"
+        if r.status_code == 200:
+            return True, None, "", False
+        if r.status_code == 429:
+            try:
+                retry_after = float(r.json().get("parameters", {}).get("retry_after", 1))
+            except ValueError:
+                retry_after = 1.0
+            return False, retry_after, r.text, True
+        if r.status_code >= 500:
+            return False, 2.0, r.text, False
+        return False, None, f"{r.status_code} {r.text}", False
+
+
+notifier = TelegramNotifier()
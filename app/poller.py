@@ -1,12 +1,26 @@
 import asyncio
+import logging
 
-from app.bot import bot, dp
+from app.bot import get_bot, dp, close_api_client
+from app.webhook import BOT_UPDATE_MODE
+from app.logs import setup_logging
+
+logger = logging.getLogger("app.poller")
 
 
 async def main():
+    if BOT_UPDATE_MODE == "webhook":
+        # delete_webhook aşağıda webhook kaydını silerdi
+        logger.warning("BOT_UPDATE_MODE=webhook iken polling başlatılmadı.")
+        return
+    bot = get_bot()
     await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    try:
+        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+    finally:
+        await close_api_client()
 
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1,39 @@
+import os
+from typing import Any, Dict, Optional
+
+from app.cache import AsyncTTLCache
+from app.models import get_user_pref_async, save_user_pref_async
+
+# Okuma önbelleği: başka bir worker'da yapılan değişiklik en geç bu süre sonra görülür
+PREFS_CACHE_TTL = float(os.getenv("PREFS_CACHE_TTL", "60"))
+PREFS_CACHE_SIZE = int(os.getenv("PREFS_CACHE_SIZE", "10000"))
+
+DEFAULT_PREFS = {"device": "desktop", "location": None}
+
+
+class UserPrefStore:
+    """
+    Kullanıcı ayarları için read-through LRU önbellek. Okumalar önbellekten karşılanır,
+    yoksa UserPreference tablosundan yüklenir (ayarı olmayan kullanıcılar da önbelleğe alınır).
+    Yazmalar önce tabloya yazılır, ardından önbellek güncellenir.
+    """
+
+    def __init__(self, ttl: float = PREFS_CACHE_TTL, max_size: int = PREFS_CACHE_SIZE):
+        self._cache = AsyncTTLCache(ttl, max_size)
+
+    async def get(self, user_id: Any) -> Dict[str, Optional[str]]:
+        key = str(user_id)
+        prefs, _ = await self._cache.get_or_load(key, lambda: self._load(key))
+        return dict(prefs)
+
+    async def update(self, user_id: Any, **fields) -> Dict[str, Optional[str]]:
+        key = str(user_id)
+        prefs = await save_user_pref_async(key, fields)
+        self._cache.set(key, prefs)
+        return dict(prefs)
+
+    async def _load(self, key: str) -> Dict[str, Optional[str]]:
+        return await get_user_pref_async(key) or dict(DEFAULT_PREFS)
+
+
+user_prefs = UserPrefStore()
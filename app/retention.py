@@ -0,0 +1,237 @@
+import os
+import sys
+import gzip
+import json
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text, delete
+from sqlmodel import Session, select
+
+from app.models import (
+    get_engine, SearchLog, init_db, run_db, partitioning_enabled,
+    ensure_searchlog_partitions, next_month,
+)
+from app.logs import setup_logging
+
+# Ham SearchLog satırlarının tutulacağı gün sayısı (0 = saklama politikası kapalı)
+LOG_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", "0"))
+LOG_ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "./archive")
+# jsonl.gz | parquet (parquet için pyarrow gerekir)
+LOG_ARCHIVE_FORMAT = os.getenv("LOG_ARCHIVE_FORMAT", "jsonl.gz")
+# Uzun kilitlerden kaçınmak için her transaction'da silinecek en fazla satır ve partiler arası bekleme
+LOG_RETENTION_BATCH = int(os.getenv("LOG_RETENTION_BATCH", "5000"))
+LOG_RETENTION_PAUSE_MS = int(os.getenv("LOG_RETENTION_PAUSE_MS", "100"))
+LOG_RETENTION_INTERVAL_MIN = int(os.getenv("LOG_RETENTION_INTERVAL_MIN", "60"))
+# LOG_PARTITIONING açıkken gelecek ayların bölümleri bu sıklıkla kontrol edilir (saklamadan bağımsız)
+LOG_PARTITION_CHECK_MIN = int(os.getenv("LOG_PARTITION_CHECK_MIN", "360"))
+
+# Birden fazla node aynı anda arşivleme yapmasın (PostgreSQL advisory lock anahtarı)
+_ADVISORY_LOCK_KEY = 720_013
+
+logger = logging.getLogger("app.retention")
+
+_COLUMNS = ["id", "query", "has_ads", "ads_count", "types", "device", "gl", "hl", "latency_ms", "created_at", "cached"]
+
+
+class ArchiveWriter:
+    """Silinecek satırları parça parça sıkıştırılmış JSONL veya Parquet dosyalarına yazar."""
+
+    def __init__(self, directory: str, fmt: str, label: str):
+        self.directory = directory
+        self.fmt = fmt
+        self.label = label
+        self.rows_written = 0
+        self.files: List[str] = []
+        self._part = 0
+        if fmt == "parquet":
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                logger.warning("LOG_ARCHIVE_FORMAT=parquet ama pyarrow kurulu değil. jsonl.gz kullanılacak.")
+                self.fmt = "jsonl.gz"
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, rows: List[Dict]):
+        """Parçayı diske yazar ve fsync eder; satırlar ancak bundan sonra silinir."""
+        if not rows:
+            return
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            self._part += 1
+            path = os.path.join(self.directory, f"{self.label}-part{self._part:04d}.parquet")
+            with open(path, "wb") as raw:
+                pq.write_table(pa.Table.from_pylist(rows), raw, compression="zstd")
+                raw.flush()
+                os.fsync(raw.fileno())
+            # Yeni dosyanın dizin kaydı da kalıcı olmalı; yoksa çökmede dosya kaybolabilir
+            _fsync_dir(self.directory)
+        else:
+            path = os.path.join(self.directory, f"{self.label}.jsonl.gz")
+            # gzip dosyasına ekleme yapmak geçerlidir (birden çok gzip üyesi)
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as gz:
+                    for row in rows:
+                        gz.write((json.dumps(row, default=str, ensure_ascii=False) + "\n").encode("utf-8"))
+                raw.flush()
+                os.fsync(raw.fileno())
+        if path not in self.files:
+            self.files.append(path)
+        self.rows_written += len(rows)
+
+
+def _fsync_dir(directory: str):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _try_lock(conn) -> bool:
+    if get_engine().dialect.name != "postgresql":
+        return True
+    return bool(conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": _ADVISORY_LOCK_KEY}).scalar())
+
+
+def _unlock(conn):
+    if get_engine().dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _ADVISORY_LOCK_KEY})
+
+
+def _row_dict(log: SearchLog) -> Dict:
+    return {col: getattr(log, col) for col in _COLUMNS}
+
+
+def _purge_rows(cutoff: datetime, writer: ArchiveWriter, batch_size: int, pause: float) -> int:
+    """cutoff'tan eski satırları parça parça arşivler ve siler. Silinen satır sayısını döner."""
+    deleted = 0
+    while True:
+        with Session(get_engine()) as session:
+            logs = list(session.exec(
+                select(SearchLog).where(SearchLog.created_at < cutoff).order_by(SearchLog.id).limit(batch_size)
+            ))
+            if not logs:
+                return deleted
+            writer.write([_row_dict(log) for log in logs])
+            ids = [log.id for log in logs]
+            # created_at koşulu bölümlü tabloda sadece ilgili bölümlerin taranmasını sağlar
+            session.execute(delete(SearchLog).where(SearchLog.id.in_(ids), SearchLog.created_at < cutoff))
+            session.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def _expired_partitions(conn, cutoff: datetime) -> List[str]:
+    """Üst sınırı cutoff'tan önce olan aylık bölümler (tamamen süresi dolmuş)."""
+    names = [row[0] for row in conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'searchlog'"
+    ))]
+    expired = []
+    for name in names:
+        try:
+            month = datetime.strptime(name, "searchlog_p%Y%m")
+        except ValueError:
+            continue  # searchlog_default vb.
+        if next_month(month) <= cutoff:
+            expired.append(name)
+    return sorted(expired)
+
+
+def _drop_partitions(cutoff: datetime, writer: ArchiveWriter, batch_size: int) -> int:
+    """Süresi tamamen dolmuş bölümleri arşivleyip ayırır ve siler. Arşivlenen satır sayısını döner."""
+    archived = 0
+    with get_engine().connect() as conn:
+        expired = _expired_partitions(conn, cutoff)
+    for name in expired:
+        last_id = 0
+        with get_engine().connect() as conn:
+            while True:
+                rows = conn.execute(text(
+                    f"SELECT {', '.join(_COLUMNS)} FROM {name} WHERE id > :last ORDER BY id LIMIT :n"
+                ), {"last": last_id, "n": batch_size}).mappings().all()
+                if not rows:
+                    break
+                writer.write([dict(row) for row in rows])
+                archived += len(rows)
+                last_id = rows[-1]["id"]
+        with get_engine().begin() as conn:
+            conn.execute(text(f"ALTER TABLE searchlog DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        logger.info("Bölüm arşivlendi ve kaldırıldı: %s", name)
+    return archived
+
+
+def apply_retention(days: int = LOG_RETENTION_DAYS, archive_dir: str = LOG_ARCHIVE_DIR,
+                    fmt: str = LOG_ARCHIVE_FORMAT, batch_size: int = LOG_RETENTION_BATCH) -> dict:
+    """
+    `days` günden eski ham SearchLog satırlarını arşiv dosyalarına aktarır ve siler.
+    Bölümlü tabloda süresi tamamen dolmuş aylar bölüm olarak ayrılıp silinir, kalanlar satır satır silinir.
+    Rollup tabloları (AdStatsHourly/AdStatsDaily) etkilenmez.
+    """
+    stats = {"archived": 0, "deleted": 0, "files": [], "skipped": False}
+    if days <= 0:
+        stats["skipped"] = True
+        return stats
+
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    writer = ArchiveWriter(archive_dir, fmt, f"searchlog-{datetime.utcnow():%Y%m%dT%H%M%S}")
+    with get_engine().connect() as lock_conn:
+        if not _try_lock(lock_conn):
+            logger.info("Saklama işlemi başka bir node'da çalışıyor, atlandı.")
+            stats["skipped"] = True
+            return stats
+        try:
+            t0 = time.perf_counter()
+            if partitioning_enabled():
+                ensure_searchlog_partitions()
+                stats["archived"] += _drop_partitions(cutoff, writer, batch_size)
+            deleted = _purge_rows(cutoff, writer, batch_size, LOG_RETENTION_PAUSE_MS / 1000)
+            stats["archived"] += deleted
+            stats["deleted"] = deleted
+            stats["files"] = writer.files
+            logger.info("Saklama: %d satır arşivlendi (%d ms).", stats["archived"], int((time.perf_counter() - t0) * 1000))
+        finally:
+            _unlock(lock_conn)
+            lock_conn.commit()
+    return stats
+
+
+async def retention_loop():
+    """
+    Saklama politikasını LOG_RETENTION_INTERVAL_MIN dakikada bir uygular (FastAPI startup'ta başlatılır).
+    Uzun sürebilen arşivleme (partiler arası beklemeler dahil) paylaşılan DB thread havuzunu meşgul etmesin
+    diye ayrı bir thread'de çalışır.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(apply_retention)
+        except Exception as e:
+            logger.exception("Saklama işleminde hata: %s", e)
+        await asyncio.sleep(LOG_RETENTION_INTERVAL_MIN * 60)
+
+async def partition_loop():
+    """SearchLog aylık bölümlerini LOG_PARTITION_CHECK_MIN dakikada bir önceden oluşturur (FastAPI startup'ta başlatılır)."""
+    while True:
+        try:
+            await run_db(ensure_searchlog_partitions)
+        except Exception as e:
+            logger.exception("Bölüm bakımında hata: %s", e)
+        await asyncio.sleep(LOG_PARTITION_CHECK_MIN * 60)
+
+
+if __name__ == "__main__":
+    # Script olarak tek seferlik çalıştırma: python -m app.retention
+    setup_logging()
+    init_db()
+    stats = apply_retention()
+    logger.info("Saklama işlemi tamamlandı.", extra=stats)
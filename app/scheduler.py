@@ -1,92 +1,279 @@
 import os
 import sys
-import httpx
-from dotenv import load_dotenv
+import time
+import socket
+import logging
 from datetime import datetime
+from typing import Dict, List, Optional
 import asyncio
 
-load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Modelleri ve SerpAPI'yi import et
-from app.models import get_due_jobs, update_job_next_run, init_db
-from app.serp import check_ads
+from app.models import (
+    claim_due_jobs_async, complete_jobs_async, init_db_async, get_ad_snapshots_async, record_ad_changes_async,
+    normalize_query,
+)
+from app.serp import check_ads, close_client, count_serpapi_requests, max_serpapi_requests
+from app.log_sink import log_sink, row_from_result
+from app.notifier import notifier
+from app.adaptive import plan_next_run, reserve_credits, refund_credits, defer_job, SERP_BUDGET_ERROR_DELAY_S
+from app.snapshots import (
+    snapshot_entries, fingerprint, encode_entries, decode_entries, diff_entries, advertisers_changed, format_diff,
+)
+from app.metrics import SCHEDULER_TICK_SECONDS, SCHEDULER_JOBS
+from app.logs import setup_logging
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 NOTIFICATION_GROUP_ID = os.getenv("TELEGRAM_NOTIFICATION_GROUP_ID")
 DEFAULT_LOCATION = os.getenv("DEFAULT_LOCATION", "Istanbul, Turkey")
-API_URL = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+# Aynı anda çalışabilecek en fazla SERP sorgusu
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", "10"))
+# Çoklu worker/node: görevler bu kimlikle kiralanır, kira süresi dolarsa başka worker alabilir
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_CLAIM_BATCH = int(os.getenv("JOB_CLAIM_BATCH", "500"))
 
-def send_telegram_notification(chat_id: str, message: str):
-    # (Bu fonksiyon bir önceki cevaptakiyle aynı)
-    payload = {'chat_id': chat_id, 'text': message, 'disable_web_page_preview': True}
+# Cron tetiklemeleri ve süreç içi zamanlayıcı turlarının üst üste binmesini engeller
+tick_lock = asyncio.Lock()
+
+logger = logging.getLogger("app.scheduler")
+
+def _resolve_location(job) -> str:
+    # Lokasyon boşsa default kullan
+    return (job.location or "").strip() or DEFAULT_LOCATION
+
+def _group_key(job) -> tuple:
+    """Aynı SERP çağrısını paylaşabilecek görevleri gruplamak için anahtar."""
+    return (normalize_query(job.query), job.device, normalize_query(_resolve_location(job)))
+
+def _build_ad_message(job, result: dict) -> str:
+    location_info = f" ({result.get('location_used', job.location)})" if result.get('location_used', job.location) else ""
+    message_header = (f"🔔 Zamanlanmış Uyarı: Reklam Bulundu!\n\n"
+                      f"Sorgu: {job.query}{location_info}\n"
+                      f"Reklam Sayısı: {result.get('ads_count', 0)} adet")
+    ad_lines = []
+    ad_details = result.get("ads", [])
+    if ad_details:
+        ad_lines.append("\n--- Bulunan Reklamlar ---")
+        for i, ad in enumerate(ad_details, start=1):
+            title = ad.get("title", "Başlık Yok")
+            url = ad.get("url", "URL Yok")
+            ad_lines.append(f"{i}) {title}\n   └ {url}")
+    return message_header + "\n" + "\n\n".join(ad_lines)
+
+def _build_diff_message(job, result: dict, diff: dict) -> str:
+    location_info = f" ({result.get('location_used', job.location)})" if result.get('location_used', job.location) else ""
+    return (f"🔔 Zamanlanmış Uyarı: Reklamverenler Değişti!\n\n"
+            f"Sorgu: {job.query}{location_info}\n"
+            f"Reklam Sayısı: {result.get('ads_count', 0)} adet\n\n"
+            f"{format_diff(diff)}")
+
+def _notify(job, text: str):
+    target_chat_id = job.telegram_user_id or NOTIFICATION_GROUP_ID
+    if target_chat_id:
+        notifier.notify(target_chat_id, text)
+
+async def _finish_job(job, result: Optional[dict], snapshot: Optional[tuple], previous: Dict[str, str]) -> bool:
+    """
+    Tek bir SERP sonucunu abone göreve uygular (bildirim, reklam seti parmak izi).
+    next_run_at run_jobs'ta toplu yazılır. Reklam seti değiştiyse True döner.
+    """
+    if result is None:
+        logger.warning("Sorgu başarısız oldu, bildirim gönderilmiyor: '%s' (görev #%s)", job.query, job.id)
+        return False
+
+    fp, entries = snapshot
+    old_fp = job.ad_fingerprint
+    changed = fp != old_fp
+    job.ad_fingerprint = fp
+
+    if job.notify_mode == "changes":
+        if not changed:
+            logger.debug("Reklamverenler değişmedi, bildirim gönderilmiyor. ('%s', görev #%s)", job.query, job.id)
+            return False
+        old_entries = decode_entries(previous[old_fp]) if old_fp in previous else None
+        diff = diff_entries(old_entries, entries)
+        if advertisers_changed(diff):
+            logger.info("Reklamverenler değişti, fark bildirimi hazırlanıyor. ('%s', görev #%s)", job.query, job.id)
+            _notify(job, _build_diff_message(job, result, diff))
+        else:
+            logger.debug("Sadece reklam başlıkları değişti, bildirim gönderilmiyor. ('%s', görev #%s)", job.query, job.id)
+    elif result.get("has_ads"):
+        logger.info("Reklam bulundu, bildirim hazırlanıyor. ('%s', görev #%s)", job.query, job.id)
+        _notify(job, _build_ad_message(job, result))
+    else:
+        logger.debug("Reklam bulunamadı, bildirim gönderilmiyor. ('%s', görev #%s)", job.query, job.id)
+    return changed
+
+async def _run_job_group(key: tuple, jobs: List, semaphore: asyncio.Semaphore, previous: Dict[str, str], changes: dict,
+                         tick_results: Dict[tuple, Optional[dict]], spent: List[int]):
+    """
+    Aynı sorgu/cihaz/konuma sahip görevler için tek SERP çağrısı yapar, sonucu tüm abonelere dağıtır.
+    Sorgu bu turda önceki bir partide zaten çalıştıysa (tick_results) sonucu tekrar kullanılır.
+    Gerçekte gönderilen SerpAPI isteği sayısı spent[0]'a eklenir (bütçe mutabakatı için).
+    """
+    lead = jobs[0]
+    if key in tick_results:
+        result = tick_results[key]
+    else:
+        result = None
+        async with semaphore:
+            logger.debug("Görev çalıştırılıyor: '%s' (%d abone)", lead.query, len(jobs))
+            with count_serpapi_requests() as used:
+                try:
+                    result = await check_ads(q=lead.query, device=lead.device, location=_resolve_location(lead))
+                    await log_sink.submit(row_from_result(result))
+                except Exception as e:
+                    logger.error("'%s' sorgusu çalıştırılamadı: %s", lead.query, e)
+            spent[0] += used[0]
+        tick_results[key] = result
+
+    snapshot = None
+    if result is not None:
+        entries = snapshot_entries(result)
+        snapshot = (fingerprint(entries), entries)
+
+    now = datetime.utcnow()
+    for job in jobs:
+        try:
+            plan_next_run(job, result, now)
+            if await _finish_job(job, result, snapshot, previous):
+                changes["snapshots"][snapshot[0]] = encode_entries(snapshot[1])
+                changes["history"].append({"job_id": job.id, "fingerprint": snapshot[0], "created_at": now})
+        except Exception as e:
+            logger.exception("Görev #%s tamamlanamadı: %s", job.id, e)
+
+async def run_jobs(jobs: List, tick_results: Optional[Dict[tuple, Optional[dict]]] = None) -> dict:
+    """
+    Bu worker'ın kiraladığı görevleri SCHEDULER_CONCURRENCY kadar eşzamanlı çalıştırır;
+    aynı sorgu/cihaz/konuma sahip görevler tek bir SERP çağrısını paylaşır. tick_results aynı turun
+    partileri arasında paylaşılır: önceki partide çalışmış bir sorgu tekrar çağrılmaz ve kredi harcamaz.
+    Günlük kredi bütçesinden her sorgu için en kötü durumdaki SerpAPI isteği sayısı kadar kredi ayrılır;
+    yetmeyen sorgular çalıştırılmaz, kredi oluşacağı zamana ertelenir. Önbellekten dönen veya erken biten
+    sorguların harcamadığı kredi tur sonunda geri verilir. Bütçe okunamazsa hiçbir yeni sorgu çalıştırılmaz.
+    Bitince tüm görevlerin next_run_at değeri tek bir toplu UPDATE ile yazılır.
+    Dönüş: {"jobs": çalışan görev, "queries": yapılan SERP sorgusu, "deferred": ertelenen görev}
+    """
+    if tick_results is None:
+        tick_results = {}
+    groups: Dict[tuple, List] = {}
+    for job in jobs:
+        groups.setdefault(_group_key(job), []).append(job)
+    logger.info("%d adet çalışacak görev bulundu (%d benzersiz sorgu).", len(jobs), len(groups))
+
+    # Bu turda sonucu zaten olan gruplar bütçeden düşülmez
+    reused = [(key, group) for key, group in groups.items() if key in tick_results]
+    # Gruplar next_run_at sırasında; en uzun süredir bekleyenler krediyi önce alır
+    ordered = [(key, group) for key, group in groups.items() if key not in tick_results]
+    deferred = 0
+    reason, budget_error = "günlük kredi bütçesi doldu", False
     try:
-        with httpx.Client() as client:
-            r = client.post(API_URL, json=payload, timeout=10)
-            if r.status_code != 200:
-                print("-> TG API Error:", r.status_code, r.text)
-            r.raise_for_status()
-        print(f"-> Bildirim başarıyla gönderildi: {chat_id}")
+        granted, taken, delays = await reserve_credits([max_serpapi_requests(_resolve_location(group[0]))
+                                                        for _, group in ordered])
     except Exception as e:
-        print(f"-> HATA: Bildirim gönderilemedi: {chat_id}, Hata: {e}")
+        # Bütçesiz çalıştırmak node'lar arası sınırı tam da gerektiği anda devre dışı bırakır
+        logger.error("Kredi bütçesi okunamadı, %d sorgu ertelendi: %s", len(ordered), e)
+        granted, taken, delays = 0, 0, [SERP_BUDGET_ERROR_DELAY_S] * len(ordered)
+        reason, budget_error = "kredi bütçesi okunamadı", True
+    now = datetime.utcnow()
+    for (_, group), delay in zip(ordered[granted:], delays):
+        for job in group:
+            defer_job(job, delay, now, reason)
+            deferred += 1
+    if delays and not budget_error:
+        logger.info("Günlük kredi bütçesi: %d sorgu (%d görev) ertelendi.", len(delays), deferred)
+    ordered = ordered[:granted]
+    runnable = reused + ordered
 
-async def run_job_once():
+    # "changes" modundaki görevlerin fark hesaplayabilmesi için önceki reklam setleri tek sorguda okunur
+    previous: Dict[str, str] = {}
+    fingerprints = list({job.ad_fingerprint for _, group in runnable for job in group
+                         if job.ad_fingerprint and job.notify_mode == "changes"})
+    try:
+        previous = await get_ad_snapshots_async(fingerprints)
+    except Exception as e:
+        logger.error("Önceki reklam setleri okunamadı: %s", e)
+
+    changes = {"snapshots": {}, "history": []}
+    spent = [0]
+    semaphore = asyncio.Semaphore(max(1, SCHEDULER_CONCURRENCY))
+    try:
+        await asyncio.gather(*(_run_job_group(key, group, semaphore, previous, changes, tick_results, spent)
+                               for key, group in runnable))
+    finally:
+        try:
+            await refund_credits(taken, spent[0])
+        except Exception as e:
+            logger.error("Kullanılmayan krediler bütçeye geri verilemedi: %s", e)
+        try:
+            # Sadece reklam seti değişen görevler için geçmiş yazılır; aynı set bir kez saklanır
+            await record_ad_changes_async(changes["snapshots"], changes["history"])
+        except Exception as e:
+            logger.error("Reklam geçmişi yazılamadı: %s", e)
+        await complete_jobs_async(WORKER_ID, jobs)
+        logger.debug("%d görevin sonraki çalışma zamanı güncellendi.", len(jobs))
+    SCHEDULER_JOBS.inc(len(jobs) - deferred, result="run")
+    SCHEDULER_JOBS.inc(deferred, result="deferred")
+    return {"jobs": len(jobs) - deferred, "queries": len(ordered), "deferred": deferred}
+
+async def run_job_once() -> dict:
     """
     Bu fonksiyon SADECE BİR KEZ çalışır ve kapanır.
     Cron Job tarafından tetiklenmek için tasarlanmıştır.
+    Önceki tetikleme hâlâ sürüyorsa yeni bir tur başlatılmaz (skipped=True).
+    Dönüş: {"jobs": çalışan görev, "queries": yapılan SERP sorgusu, "deferred": bütçe nedeniyle ertelenen, "duration_ms": süre}
     """
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Cron Job tetiklendi. Zamanı gelmiş görevler aranıyor...")
-    
-    # Veritabanını başlat
-    init_db()
-    
-    if not NOTIFICATION_GROUP_ID:
-        print("UYARI: .env dosyasında TELEGRAM_NOTIFICATION_GROUP_ID bulunamadı.")
+    t0 = time.perf_counter()
+    stats = {"jobs": 0, "queries": 0, "deferred": 0, "duration_ms": 0}
+    if tick_lock.locked():
+        logger.warning("Önceki zamanlayıcı turu hâlâ çalışıyor, bu tetikleme atlandı.")
+        stats["skipped"] = True
+        return stats
 
-    try:
-        due_jobs = get_due_jobs()
-        if due_jobs:
-            print(f"-> {len(due_jobs)} adet çalışacak görev bulundu.")
-
-            for job in due_jobs:
-                print(f"--> Görev çalıştırılıyor: '{job.query}'")
-                # Lokasyon boşsa default kullan
-                loc = (job.location or "").strip() or DEFAULT_LOCATION
-                result = await check_ads(q=job.query, device=job.device, location=loc)
-                
-                if result.get("has_ads"):
-                    print(f"--> REKLAM BULUNDU! Bildirim hazırlanıyor...")
-                    # ... (Bildirim mesajı oluşturma kodu aynı) ...
-                    location_info = f" ({result.get('location_used', job.location)})" if result.get('location_used', job.location) else ""
-                    message_header = (f"🔔 Zamanlanmış Uyarı: Reklam Bulundu!\n\n"
-                                      f"Sorgu: {job.query}{location_info}\n"
-                                      f"Reklam Sayısı: {result.get('ads_count', 0)} adet")
-                    ad_lines = []
-                    ad_details = result.get("ads", [])
-                    if ad_details:
-                        ad_lines.append("\n--- Bulunan Reklamlar ---")
-                        for i, ad in enumerate(ad_details, start=1):
-                            title = ad.get("title", "Başlık Yok")
-                            url = ad.get("url", "URL Yok")
-                            ad_lines.append(f"{i}) {title}\n   └ {url}")
-                    message = message_header + "\n" + "\n\n".join(ad_lines)
-
-                    target_chat_id = job.telegram_user_id or NOTIFICATION_GROUP_ID
-                    if target_chat_id:
-                        send_telegram_notification(target_chat_id, message)
-                else:
-                    print(f"--> Reklam bulunamadı, bildirim gönderilmiyor.")
-                
-                update_job_next_run(job.id, job.interval_minutes)
-                print(f"--> Görev tamamlandı ve güncellendi: '{job.query}'")
-        else:
-            print("-> Çalıştırılacak zamanı gelmiş görev bulunamadı.")
+    async with tick_lock:
+        logger.info("Cron Job tetiklendi. Zamanı gelmiş görevler aranıyor...")
 
-    except Exception as e:
-        print(f"Cron Job çalışırken bir hata oluştu: {e}")
+        if not NOTIFICATION_GROUP_ID:
+            logger.warning(".env dosyasında TELEGRAM_NOTIFICATION_GROUP_ID bulunamadı.")
+
+        # Aynı sorgu bu turun farklı partilerinde de tek kez çalıştırılır
+        tick_results: Dict[tuple, Optional[dict]] = {}
+        try:
+            while True:
+                # Diğer worker/node'larla çakışmamak için görevler partiler hâlinde kiralanır
+                due_jobs = await claim_due_jobs_async(WORKER_ID, JOB_CLAIM_BATCH, JOB_LEASE_SECONDS)
+                if not due_jobs:
+                    break
+                batch_stats = await run_jobs(due_jobs, tick_results)
+                stats["jobs"] += batch_stats["jobs"]
+                stats["queries"] += batch_stats["queries"]
+                stats["deferred"] += batch_stats["deferred"]
+                if len(due_jobs) < JOB_CLAIM_BATCH:
+                    break
+            if not stats["jobs"] and not stats["deferred"]:
+                logger.info("Çalıştırılacak zamanı gelmiş görev bulunamadı.")
+
+        except Exception as e:
+            logger.exception("Cron Job çalışırken bir hata oluştu: %s", e)
     
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Cron Job tamamlandı.")
+    elapsed = time.perf_counter() - t0
+    stats["duration_ms"] = int(elapsed * 1000)
+    SCHEDULER_TICK_SECONDS.observe(elapsed, source="cron")
+    logger.info("Cron Job tamamlandı. %d görev, %d sorgu, %d ms.", stats["jobs"], stats["queries"], stats["duration_ms"],
+                extra={"deferred": stats["deferred"]})
+    return stats
+
+async def _run_standalone():
+    try:
+        # Şema süreç başına bir kez kurulur (API sürecinde on_startup'ta); her tetiklemede değil
+        await init_db_async()
+        await run_job_once()
+    finally:
+        await notifier.stop()
+        await log_sink.stop()
+        await close_client()
 
 if __name__ == "__main__":
     # Script'i bir kez çalıştırıp bitir
-    asyncio.run(run_job_once())
+    setup_logging()
+    asyncio.run(_run_standalone())
@@ -1,59 +1,382 @@
-from dotenv import load_dotenv
-load_dotenv()
-
 import os
 import time
+import asyncio
+import logging
 import httpx
+import orjson
 from httpx import HTTPStatusError
+from contextlib import contextmanager
+from contextvars import ContextVar
 from urllib.parse import urlparse
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+
+from app.cache import AsyncTTLCache
+from app.models import normalize_query
+from app.keypool import (
+    KeyPool, CircuitBreaker, CircuitOpenError, NoKeyAvailableError, parse_keys, backoff_delay, SERPAPI_MAX_RETRIES,
+)
+from app.metrics import (
+    SERPAPI_ATTEMPT_SECONDS, SERPAPI_REQUESTS, SERPAPI_ERRORS, SERP_STRATEGY_FALLBACKS, CHECK_ADS_SECONDS, SERP_CACHE_REQUESTS,
+)
+
+logger = logging.getLogger(__name__)
 
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+# Birden çok anahtar: "anahtar[:ağırlık[:eşzamanlılık]],..." (yoksa tek SERPAPI_KEY kullanılır)
+SERPAPI_KEYS = os.getenv("SERPAPI_KEYS") or SERPAPI_KEY or ""
+# Test/benchmark için yerel bir taklit sunucuya yönlendirilebilir (bkz. bench/)
+SERPAPI_BASE_URL = os.getenv("SERPAPI_BASE_URL", "https://serpapi.com").rstrip("/")
+SERPAPI_SEARCH_URL = f"{SERPAPI_BASE_URL}/search"
+SERPAPI_ACCOUNT_URL = f"{SERPAPI_BASE_URL}/account"
+# SerpAPI'den sadece kullanılan alanları iste (organik sonuçlar, knowledge graph vb. gelmez); boş: tam yanıt
+SERPAPI_JSON_RESTRICTOR = os.getenv("SERPAPI_JSON_RESTRICTOR", "ads,ad_results,shopping_results,inline_shopping_results")
+SERPAPI_QUOTA_REFRESH_MIN = int(os.getenv("SERPAPI_QUOTA_REFRESH_MIN", "60"))
 GOOGLE_DOMAIN = os.getenv("GOOGLE_DOMAIN", "google.com.tr")
 DEFAULT_GL = os.getenv("DEFAULT_GL", "tr")
 DEFAULT_HL = os.getenv("DEFAULT_HL", "tr")
 
+# --- Paylaşılan HTTP istemcisi ayarları ---
+SERPAPI_MAX_CONNECTIONS = int(os.getenv("SERPAPI_MAX_CONNECTIONS", "20"))
+SERPAPI_MAX_KEEPALIVE = int(os.getenv("SERPAPI_MAX_KEEPALIVE", "10"))
+SERPAPI_KEEPALIVE_EXPIRY = float(os.getenv("SERPAPI_KEEPALIVE_EXPIRY", "30"))
+SERPAPI_CONNECT_TIMEOUT = float(os.getenv("SERPAPI_CONNECT_TIMEOUT", "5"))
+SERPAPI_READ_TIMEOUT = float(os.getenv("SERPAPI_READ_TIMEOUT", "20"))
+SERPAPI_HTTP2 = os.getenv("SERPAPI_HTTP2", "false").lower() in ("1", "true", "yes")
+
+_client: Optional[httpx.AsyncClient] = None
+_key_pool = KeyPool(parse_keys(SERPAPI_KEYS))
+_breaker = CircuitBreaker()
+
+# --- Sonuç önbelleği (TTL + LRU) ---
+SERP_CACHE_TTL = float(os.getenv("SERP_CACHE_TTL", "300"))
+SERP_CACHE_MAX_SIZE = int(os.getenv("SERP_CACHE_MAX_SIZE", "1024"))
+
+_result_cache = AsyncTTLCache(ttl=SERP_CACHE_TTL, max_size=SERP_CACHE_MAX_SIZE)
+
+# --- Konum stratejisi modu ---
+# sequential: stratejiler sırayla denenir (varsayılan)
+# parallel:   tüm stratejiler aynı anda başlatılır
+# hedged:     ilk strateji SERP_HEDGE_DELAY_MS içinde cevap vermezse yedekler de başlatılır
+STRATEGY_MODES = ("sequential", "parallel", "hedged")
+SERP_STRATEGY_MODE = os.getenv("SERP_STRATEGY_MODE", "sequential")
+SERP_HEDGE_DELAY_MS = int(os.getenv("SERP_HEDGE_DELAY_MS", "1500"))
+
+# count_serpapi_requests bloğundaki sayaç; içeride başlatılan task'lar (paralel stratejiler) da aynı sayacı görür
+_request_counter: ContextVar[Optional[List[int]]] = ContextVar("serpapi_request_counter", default=None)
+
+@contextmanager
+def count_serpapi_requests():
+    """
+    Blok içinde SerpAPI'ye gönderilen arama isteklerini (tekrar denemeler dahil) sayar: `with ... as used:`
+    sonrası used[0]. Önbellekten dönen veya başka bir isteğin yüklemesine katılan çağrılar istek saymaz.
+    """
+    counter = [0]
+    token = _request_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _request_counter.reset(token)
+
 def _host(u: str) -> str:
     try:
         return urlparse(u).netloc.replace("www.", "")
     except Exception:
         return u
 
+def _build_client() -> httpx.AsyncClient:
+    http2 = SERPAPI_HTTP2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("SERPAPI_HTTP2 açık ama 'h2' paketi kurulu değil. HTTP/1.1 kullanılacak.")
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(SERPAPI_READ_TIMEOUT, connect=SERPAPI_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=SERPAPI_MAX_CONNECTIONS,
+            max_keepalive_connections=SERPAPI_MAX_KEEPALIVE,
+            keepalive_expiry=SERPAPI_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+async def open_client() -> httpx.AsyncClient:
+    """Süreç genelinde paylaşılan SerpAPI istemcisini açar (FastAPI startup'ta çağrılır)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+async def close_client() -> None:
+    """Paylaşılan istemciyi kapatır (FastAPI shutdown'da çağrılır)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _safe_url(url: httpx.URL) -> str:
+    # Loglara API anahtarını yazma
+    return str(url.copy_remove_param("api_key"))
+
 async def _make_serpapi_request(params: dict) -> dict:
-    async with httpx.AsyncClient(timeout=20) as client:
+    """
+    Havuzdan bir anahtarla SerpAPI araması yapar. Ağ hataları, 5xx ve 401/429 (başka anahtarla)
+    jitter'lı üstel beklemeyle tekrar denenir. Devre açıksa beklemeden CircuitOpenError fırlatır.
+    """
+    # Startup hook'u çalışmadıysa (örn. scheduler script olarak çalıştırıldığında) istemci burada açılır
+    client = await open_client()
+    last_error: Optional[Exception] = None
+    last_key = None
+    for attempt in range(SERPAPI_MAX_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(backoff_delay(attempt - 1))
+        try:
+            is_trial = _breaker.before_request()
+        except CircuitOpenError:
+            SERPAPI_ERRORS.inc(kind="circuit_open")
+            raise
         try:
-            r = await client.get("https://serpapi.com/search", params=params)
+            async with _key_pool.acquire(exclude=last_key) as key:
+                last_key = key
+                counter = _request_counter.get()
+                if counter is not None:
+                    counter[0] += 1
+                try:
+                    r = await client.get(SERPAPI_SEARCH_URL, params={**params, "api_key": key.value})
+                except httpx.TransportError as e:
+                    _breaker.record_failure()
+                    SERPAPI_ERRORS.inc(kind="transport")
+                    logger.warning("SerpAPI bağlantı hatası (%s), deneme %d/%d",
+                                   e.__class__.__name__, attempt + 1, SERPAPI_MAX_RETRIES + 1)
+                    last_error = e
+                    continue
+
+                SERPAPI_REQUESTS.inc(status=str(r.status_code))
+                if r.status_code == 200:
+                    _breaker.record_success()
+                    _key_pool.report_success(key)
+                    # orjson stdlib json'dan birkaç kat hızlı çözer
+                    return orjson.loads(r.content)
+
+                SERPAPI_ERRORS.inc(kind=f"http_{r.status_code}")
+                logger.warning("SerpAPI HTTP %d: %s", r.status_code, _safe_url(r.request.url),
+                               extra={"status": r.status_code, "body": r.text[:500]})
+                try:
+                    r.raise_for_status()
+                except HTTPStatusError as e:
+                    last_error = e
+                if r.status_code in (401, 429):
+                    # Anahtara özgü hata: upstream sağlıklı, başka anahtarla tekrar dene
+                    await _key_pool.report_status(key, r.status_code)
+                elif r.status_code >= 500:
+                    _breaker.record_failure()
+                else:
+                    # Diğer 4xx'ler (örn. geçersiz parametre) tekrar denemeyle düzelmez
+                    _breaker.record_success()
+                    raise last_error
+        except NoKeyAvailableError:
+            SERPAPI_ERRORS.inc(kind="no_key")
+            raise
+        finally:
+            if is_trial:
+                _breaker.release_trial()
+    raise last_error
+
+async def refresh_key_quotas() -> None:
+    """Her anahtarın kalan arama kredisini SerpAPI hesap bilgisinden günceller."""
+    client = await open_client()
+    for key in _key_pool.keys:
+        try:
+            r = await client.get(SERPAPI_ACCOUNT_URL, params={"api_key": key.value})
+            if r.status_code == 401:
+                await _key_pool.report_status(key, 401)
+                continue
             r.raise_for_status()
-            return r.json()
-        except HTTPStatusError as e:
-            body = e.response.text if e.response is not None else ""
-            status = e.response.status_code if e.response is not None else "NA"
-            print(f"[SERPAPI HTTP {status}] {e.request.url}\nBody: {body}")
+            data = r.json()
+            left = data.get("total_searches_left", data.get("plan_searches_left"))
+            if left is not None:
+                key.remaining = int(left)
+        except Exception as e:
+            logger.warning("SerpAPI anahtarı %s için kota bilgisi alınamadı: %s", key.label, e)
+
+async def quota_refresh_loop():
+    """Anahtar kotalarını SERPAPI_QUOTA_REFRESH_MIN dakikada bir yeniler (FastAPI startup'ta başlatılır)."""
+    while True:
+        await refresh_key_quotas()
+        await asyncio.sleep(SERPAPI_QUOTA_REFRESH_MIN * 60)
+
+def serpapi_status() -> dict:
+    return {"circuit": _breaker.state, "consecutive_failures": _breaker.failures, "keys": _key_pool.snapshot()}
+
+def _cache_key(q: str, gl: str, hl: str, device: str, location: Optional[str]) -> tuple:
+    norm_q = normalize_query(q)
+    norm_loc = normalize_query(location) if location and location.strip() else None
+    norm_device = "mobile" if device == "mobile" else "desktop"
+    return (norm_q, (gl or "").lower(), (hl or "").lower(), norm_device, norm_loc)
+
+async def check_ads(q: str, gl: str = DEFAULT_GL, hl: str = DEFAULT_HL, device: str = "desktop", location: Optional[str] = None, max_age: Optional[float] = None, strategy_mode: Optional[str] = None, hedge_delay_ms: Optional[int] = None):
+    """
+    Önbellekli reklam kontrolü. max_age (saniye) verilirse bu yaştan eski kayıtlar kullanılmaz;
+    max_age=0 önbelleği atlar. Aynı anda gelen aynı sorgular tek bir SerpAPI çağrısını paylaşır.
+    strategy_mode: "sequential" | "parallel" | "hedged" (boşsa SERP_STRATEGY_MODE kullanılır).
+    """
+    def load():
+        return _check_ads_uncached(q, gl=gl, hl=hl, device=device, location=location, strategy_mode=strategy_mode, hedge_delay_ms=hedge_delay_ms)
+
+    with CHECK_ADS_SECONDS.time(cached="false", outcome="error") as labels:
+        if not _result_cache.enabled:
+            res = await load()
+            res["cached"] = False
+            labels["outcome"] = "ok"
+            return res
+
+        t0 = time.perf_counter()
+        key = _cache_key(q, gl, hl, device, location)
+        res, age = await _result_cache.get_or_load(key, load, max_age=max_age)
+        labels["outcome"] = "ok"
+        SERP_CACHE_REQUESTS.inc(result="miss" if age is None else "hit")
+        # Önbellekteki kaydı çağıranların değiştirmemesi için kopyala
+        out = dict(res, ads=[dict(ad) for ad in res["ads"]], types=list(res["types"]))
+        if age is None:
+            out["cached"] = False
+            return out
+        labels["cached"] = "true"
+
+        # Önbellekten gelen yanıt: gecikme bu isteğin gerçek süresi, upstream süresi ayrıca raporlanır
+        out["query"] = q
+        out["cached"] = True
+        out["cache_age_s"] = round(age, 1)
+        out["upstream_latency_ms"] = res["latency_ms"]
+        out["latency_ms"] = int((time.perf_counter() - t0) * 1000)
+        return out
+
+class AdRecord:
+    """Reklamın kullanılan alanları; ham yanıttaki iç içe sözlük deneme biter bitmez bırakılır."""
+    __slots__ = ("title", "link")
+
+    def __init__(self, title: str, link: str):
+        self.title = title
+        self.link = link
+
+class SerpPage:
+    """Bir SerpAPI yanıtından check_ads'in ihtiyaç duyduğu kısım."""
+    __slots__ = ("ads", "has_shopping")
+
+    def __init__(self, ads: Tuple[AdRecord, ...], has_shopping: bool):
+        self.ads = ads
+        self.has_shopping = has_shopping
+
+def _parse_page(data: dict) -> SerpPage:
+    raw_ads = data.get("ads") or data.get("ad_results") or []
+    ads = tuple(
+        AdRecord(
+            ad.get("title") or ad.get("headline") or "",
+            ad.get("link") or ad.get("displayed_link") or ad.get("tracking_link") or "",
+        )
+        for ad in raw_ads
+    )
+    return SerpPage(ads, bool(data.get("shopping_results") or data.get("inline_shopping_results")))
+
+async def _run_attempt(base_params: dict, attempt: Dict) -> SerpPage:
+    logger.debug("Arama denemesi yapılıyor... Strateji: %s", attempt["name"])
+    current_params = base_params.copy()
+    current_params.update(attempt["params"])
+    # Etiket olarak konumu içeren ad yerine strateji türü kullanılır (sınırlı kardinalite)
+    with SERPAPI_ATTEMPT_SECONDS.time(strategy=attempt["kind"], outcome="error") as labels:
+        try:
+            page = _parse_page(await _make_serpapi_request(current_params))
+        except asyncio.CancelledError:
+            labels["outcome"] = "cancelled"
             raise
+        labels["outcome"] = "ads" if page.ads else "no_ads"
+        return page
 
-async def check_ads(q: str, gl: str = DEFAULT_GL, hl: str = DEFAULT_HL, device: str = "desktop", location: Optional[str] = None):
-    if not SERPAPI_KEY:
-        raise RuntimeError("SERPAPI_KEY .env dosyasında eksik!")
+async def _run_sequential(base_params: dict, attempts: List[Dict]) -> Tuple[Optional[SerpPage], Optional[Dict]]:
+    """Stratejileri sırayla dener. (son_sayfa, reklam_bulan_strateji) döner."""
+    page = None
+    for i, attempt in enumerate(attempts):
+        if i:
+            SERP_STRATEGY_FALLBACKS.inc()
+        try:
+            page = await _run_attempt(base_params, attempt)
+        except (CircuitOpenError, NoKeyAvailableError):
+            # Diğer stratejiler de aynı sebeple başarısız olur; hemen dön
+            raise
+        except Exception as e:
+            logger.warning("Strateji hata verdi (%s), sıradaki denenecek: %s", attempt["name"], e)
+            continue
 
-    base_params = {
-        "engine": "google", "q": q, "gl": gl, "hl": hl,
-        "google_domain": GOOGLE_DOMAIN, "api_key": SERPAPI_KEY,
-        "device": "mobile" if device == "mobile" else "desktop", "num": 10,
-    }
+        if page.ads:
+            logger.info("Reklam bulundu. Strateji: %s", attempt["name"])
+            return page, attempt
+        logger.debug("Reklam bulunamadı (%s). Sonraki strateji denenecek...", attempt["name"])
+    return page, None
+
+async def _run_concurrent(base_params: dict, attempts: List[Dict], hedge_delay: Optional[float]) -> Tuple[Optional[SerpPage], Optional[Dict]]:
+    """
+    Stratejileri eşzamanlı çalıştırır. hedge_delay (saniye) verilirse yedek stratejiler ancak
+    ilk deneme bu süre içinde reklamla sonuçlanmazsa başlatılır.
+    Öncelik sırası korunur: reklam bulan bir denemenin sonucu, kendisinden önceki tüm denemeler
+    reklamsız/hatalı bittiğinde kabul edilir ve kalan denemeler iptal edilir.
+    """
+    tasks: List[Optional[asyncio.Task]] = [None] * len(attempts)
+    tasks[0] = asyncio.create_task(_run_attempt(base_params, attempts[0]))
+    try:
+        if hedge_delay is not None:
+            await asyncio.wait({tasks[0]}, timeout=hedge_delay)
+            first = tasks[0]
+            if first.done() and first.exception() is None and first.result().ads:
+                logger.info("Reklam bulundu. Strateji: %s", attempts[0]["name"])
+                return first.result(), attempts[0]
+            logger.debug("İlk strateji yetişmedi veya reklam yok, yedek stratejiler başlatılıyor...")
+            SERP_STRATEGY_FALLBACKS.inc(len(attempts) - 1)
+
+        for i in range(1, len(attempts)):
+            tasks[i] = asyncio.create_task(_run_attempt(base_params, attempts[i]))
 
+        while True:
+            for i, task in enumerate(tasks):
+                if not task.done():
+                    break
+                if task.exception() is None and task.result().ads:
+                    logger.info("Reklam bulundu. Strateji: %s", attempts[i]["name"])
+                    return task.result(), attempts[i]
+            else:
+                # Hepsi bitti, hiçbirinde reklam yok: sıralı moddaki gibi son başarılı veriyi döndür
+                page = None
+                for i, task in enumerate(tasks):
+                    if task.exception() is not None:
+                        logger.warning("Strateji hata verdi (%s): %s", attempts[i]["name"], task.exception())
+                    else:
+                        page = task.result()
+                logger.debug("Hiçbir stratejide reklam bulunamadı.")
+                return page, None
+            await asyncio.wait([t for t in tasks if not t.done()], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            if task is None:
+                continue
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # "exception was never retrieved" uyarısını engelle
+
+def _search_attempts(location: Optional[str]) -> List[Dict]:
+    """Konuma göre denenecek arama stratejileri, öncelik sırasıyla."""
     search_attempts: List[Dict] = []
     
     # Adım 1: En geniş arama. Konumsuz, genel Türkiye araması (VPN taklidi).
-    search_attempts.append({"params": {}, "name": "Genel Türkiye (Konumsuz)"})
+    search_attempts.append({"params": {}, "name": "Genel Türkiye (Konumsuz)", "kind": "general"})
 
     # Adım 2: Şehir bazlı arama (eğer kullanıcı bir konum girdiyse).
     if location:
         clean_location = location.split('/')[0].strip() + ", Turkey"
-        search_attempts.append({"params": {"location": clean_location}, "name": f"Şehir Bazlı: {clean_location}"})
+        search_attempts.append({"params": {"location": clean_location}, "name": f"Şehir Bazlı: {clean_location}", "kind": "city"})
 
     # Adım 3 (Nadir durumlar için): Kullanıcının girdiği ham veriyi de deneyelim.
     if location and clean_location != location:
-         search_attempts.append({"params": {"location": location}, "name": f"Ham Konum: {location}"})
+         search_attempts.append({"params": {"location": location}, "name": f"Ham Konum: {location}", "kind": "raw"})
     
     unique_attempts = []
     seen = set()
@@ -62,54 +385,60 @@ async def check_ads(q: str, gl: str = DEFAULT_GL, hl: str = DEFAULT_HL, device:
         if key not in seen:
             unique_attempts.append(attempt)
             seen.add(key)
+    return unique_attempts
+
+def max_serpapi_requests(location: Optional[str]) -> int:
+    """Bir check_ads çağrısının en kötü durumda yapabileceği SerpAPI isteği (her strateji, her tekrar deneme)."""
+    return len(_search_attempts(location)) * (SERPAPI_MAX_RETRIES + 1)
+
+async def _check_ads_uncached(q: str, gl: str = DEFAULT_GL, hl: str = DEFAULT_HL, device: str = "desktop", location: Optional[str] = None, strategy_mode: Optional[str] = None, hedge_delay_ms: Optional[int] = None):
+    if not len(_key_pool):
+        raise RuntimeError("SERPAPI_KEY veya SERPAPI_KEYS .env dosyasında eksik!")
+
+    base_params = {
+        "engine": "google", "q": q, "gl": gl, "hl": hl,
+        "google_domain": GOOGLE_DOMAIN,
+        "device": "mobile" if device == "mobile" else "desktop", "num": 10,
+    }
+    if SERPAPI_JSON_RESTRICTOR:
+        base_params["json_restrictor"] = SERPAPI_JSON_RESTRICTOR
+
+    unique_attempts = _search_attempts(location)
+
+    mode = strategy_mode or SERP_STRATEGY_MODE
+    if mode not in STRATEGY_MODES:
+        raise ValueError(f"Geçersiz strateji modu: {mode}")
 
     t0 = time.perf_counter()
-    final_data = None
-    location_used = location
-    
-    for attempt in unique_attempts:
-        print(f"-> Arama denemesi yapılıyor... Strateji: {attempt['name']}")
-        current_params = base_params.copy()
-        current_params.update(attempt["params"])
-        
-        try:
-            data = await _make_serpapi_request(current_params)
-        except Exception as e:
-            print(f"--> Strateji hata verdi, siradaki denenecek. Hata: {e}")
-            continue
-        raw_ads = data.get("ads") or data.get("ad_results") or []
-
-        if raw_ads:
-            print(f"--> REKLAM BULUNDU! Strateji: {attempt['name']}")
-            final_data = data
-            location_used = attempt["params"].get("location")
-            break 
-        else:
-            print(f"--> Reklam bulunamadı. Sonraki strateji denenecek...")
-    
-    if not final_data:
-        final_data = data
-    
+    if mode == "sequential" or len(unique_attempts) == 1:
+        final_page, winner = await _run_sequential(base_params, unique_attempts)
+    else:
+        delay_ms = SERP_HEDGE_DELAY_MS if hedge_delay_ms is None else hedge_delay_ms
+        hedge_delay = delay_ms / 1000 if mode == "hedged" else None
+        final_page, winner = await _run_concurrent(base_params, unique_attempts, hedge_delay)
+
+    if final_page is None:
+        raise RuntimeError("Tüm arama stratejileri hata verdi.")
+    location_used = winner["params"].get("location") if winner else location
+
     latency_ms = int((time.perf_counter() - t0) * 1000)
-    final_raw_ads = final_data.get("ads") or final_data.get("ad_results") or []
-    has_ads = len(final_raw_ads) > 0
+    has_ads = len(final_page.ads) > 0
 
-    details = []
-    for i, ad in enumerate(final_raw_ads, start=1):
-        title = ad.get("title") or ad.get("headline") or ""
-        link = ad.get("link") or ad.get("displayed_link") or ad.get("tracking_link") or ""
-        details.append({"pos": i, "title": title, "url": link, "domain": _host(link)})
+    details = [
+        {"pos": i, "title": ad.title, "url": ad.link, "domain": _host(ad.link)}
+        for i, ad in enumerate(final_page.ads, start=1)
+    ]
 
     types = []
     if has_ads:
         types.append("search")
-    if final_data.get("shopping_results") or final_data.get("inline_shopping_results"):
+    if final_page.has_shopping:
         types.append("shopping")
 
     return {
         "query": q,
         "has_ads": has_ads,
-        "ads_count": len(final_raw_ads),
+        "ads_count": len(final_page.ads),
         "types": types,
         "latency_ms": latency_ms,
         "gl": gl,
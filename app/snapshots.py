@@ -0,0 +1,73 @@
+import json
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+# Reklam seti: sıralı (domain, başlık) çiftleri
+Entries = List[Tuple[str, str]]
+
+
+def snapshot_entries(result: dict) -> Entries:
+    return [(ad.get("domain") or "", ad.get("title") or "") for ad in result.get("ads", [])]
+
+
+def fingerprint(entries: Entries) -> str:
+    """Sıralı (domain, başlık) listesinin kısa parmak izi; aynı reklam seti her zaman aynı değeri verir."""
+    payload = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def encode_entries(entries: Entries) -> str:
+    return json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode_entries(raw: str) -> Entries:
+    return [tuple(item) for item in json.loads(raw)]
+
+
+def _positions(entries: Entries) -> Dict[str, Tuple[int, str]]:
+    """domain -> (ilk sırası, başlığı)"""
+    positions: Dict[str, Tuple[int, str]] = {}
+    for i, (domain, title) in enumerate(entries, start=1):
+        positions.setdefault(domain, (i, title))
+    return positions
+
+
+def diff_entries(old: Optional[Entries], new: Entries) -> dict:
+    """
+    İki reklam seti arasındaki reklamveren farkı.
+    Dönüş: {"added": [(sıra, domain, başlık)], "removed": [...], "moved": [(domain, eski, yeni)], "retitled": [...]}
+    """
+    before = _positions(old or [])
+    after = _positions(new)
+    diff = {"added": [], "removed": [], "moved": [], "retitled": []}
+    for domain, (pos, title) in after.items():
+        if domain not in before:
+            diff["added"].append((pos, domain, title))
+            continue
+        old_pos, old_title = before[domain]
+        if old_pos != pos:
+            diff["moved"].append((domain, old_pos, pos))
+        if old_title != title:
+            diff["retitled"].append((pos, domain, title))
+    for domain, (pos, title) in before.items():
+        if domain not in after:
+            diff["removed"].append((pos, domain, title))
+    return diff
+
+
+def advertisers_changed(diff: dict) -> bool:
+    """Sadece başlık değişikliği reklamveren değişikliği sayılmaz."""
+    return bool(diff["added"] or diff["removed"] or diff["moved"])
+
+
+def format_diff(diff: dict) -> str:
+    lines = []
+    for pos, domain, title in diff["added"]:
+        lines.append(f"➕ {pos}) {domain} — {title}")
+    for pos, domain, title in diff["removed"]:
+        lines.append(f"➖ {domain} (önceki sıra {pos}) — {title}")
+    for domain, old_pos, new_pos in diff["moved"]:
+        lines.append(f"↕️ {domain}: {old_pos}. sıradan {new_pos}. sıraya")
+    for pos, domain, title in diff["retitled"]:
+        lines.append(f"✏️ {pos}) {domain} yeni başlık: {title}")
+    return "\n".join(lines)
@@ -0,0 +1,135 @@
+import os
+import hmac
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+# polling: API süreci long-polling yapar (tek worker) | webhook: güncellemeler /telegram/webhook'a gelir
+# off: API süreci bot güncellemelerini almaz (örn. app/poller.py ayrı çalışıyor)
+BOT_UPDATE_MODE = os.getenv("BOT_UPDATE_MODE", "polling")
+# Telegram'a bildirilecek herkese açık adres, örn. https://example.onrender.com/telegram/webhook
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL")
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+WEBHOOK_QUEUE_MAX = int(os.getenv("WEBHOOK_QUEUE_MAX", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "8"))
+WEBHOOK_SHUTDOWN_TIMEOUT = float(os.getenv("WEBHOOK_SHUTDOWN_TIMEOUT", "10"))
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+logger = logging.getLogger(__name__)
+
+
+def verify_secret(token: Optional[str]) -> bool:
+    if not TELEGRAM_WEBHOOK_SECRET:
+        return False
+    return hmac.compare_digest((token or "").encode(), TELEGRAM_WEBHOOK_SECRET.encode())
+
+
+def _partition_key(data: Dict[str, Any]) -> int:
+    """Aynı sohbetin güncellemeleri aynı consumer'a gider; böylece sırası korunur (örn. /mobile → sorgu)."""
+    for value in data.values():
+        if not isinstance(value, dict):
+            continue
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return int(chat["id"])
+        sender = value.get("from")
+        if sender and "id" in sender:
+            return int(sender["id"])
+    return int(data.get("update_id", 0))
+
+
+class UpdateQueue:
+    """
+    Webhook'tan gelen güncellemeleri sınırlı kuyruklarda tutar ve WEBHOOK_WORKERS consumer ile işler.
+    Endpoint güncellemeyi kuyruğa koyup hemen cevap verir; yavaş SERP sorguları Telegram'ın
+    onayını bekletmez. Kuyruk doluysa submit False döner ve Telegram güncellemeyi sonra tekrar gönderir.
+    """
+
+    def __init__(self, workers: int = WEBHOOK_WORKERS, max_queue: int = WEBHOOK_QUEUE_MAX):
+        self.workers = max(1, workers)
+        self.max_queue = max_queue
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        if self.running:
+            return
+        per_worker = max(1, self.max_queue // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._consume(q)) for q in self._queues]
+
+    async def stop(self):
+        """Kuyruktaki güncellemelerin işlenmesini bekler ve consumer'ları kapatır."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self._queues)), timeout=WEBHOOK_SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning("%d Telegram güncellemesi kapanışta işlenemedi.", sum(q.qsize() for q in self._queues))
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, data: Dict[str, Any]) -> bool:
+        if not self.running:
+            self.start()
+        queue = self._queues[_partition_key(data) % self.workers]
+        try:
+            queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(q.qsize() for q in self._queues),
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+    async def _consume(self, queue: asyncio.Queue):
+        # aiogram sadece webhook modu gerçekten kullanılınca yüklenir (soğuk başlangıç)
+        from aiogram.types import Update
+        from app.bot import get_bot, dp
+
+        bot = get_bot()
+        while True:
+            data = await queue.get()
+            try:
+                update = Update.model_validate(data, context={"bot": bot})
+                await dp.feed_update(bot, update)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.exception("Telegram güncellemesi işlenemedi (update_id=%s): %s", data.get("update_id"), e)
+            finally:
+                queue.task_done()
+
+
+async def register_webhook():
+    """TELEGRAM_WEBHOOK_URL verilmişse webhook'u Telegram'a kaydeder (her worker'da çalışması zararsızdır)."""
+    if not TELEGRAM_WEBHOOK_URL:
+        logger.warning("TELEGRAM_WEBHOOK_URL ayarlanmamış, webhook Telegram'a kaydedilmedi.")
+        return
+    from app.bot import get_bot, dp
+
+    await get_bot().set_webhook(
+        TELEGRAM_WEBHOOK_URL,
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("Telegram webhook kaydedildi: %s", TELEGRAM_WEBHOOK_URL)
+
+
+update_queue = UpdateQueue()
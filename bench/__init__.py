@@ -0,0 +1 @@
+"""SerpAPI/Telegram taklitleriyle çevrimdışı benchmark araçları; kullanım için bench/__main__.py."""
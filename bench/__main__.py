@@ -0,0 +1,25 @@
+"""
+Benchmark girişi:
+
+    python -m bench load [--duration 20 --concurrency 20 ...]
+    python -m bench scheduler [--jobs 10000 --queries 500 ...]
+
+Her alt komut --out ile JSON rapor yazar; --baseline verilirse önceki rapora göre
+--tolerance oranından fazla gerileme olduğunda sıfırdan farklı kodla çıkar.
+"""
+import sys
+
+from bench import load, scheduler_bench
+
+COMMANDS = {"load": load.main, "scheduler": scheduler_bench.main}
+
+
+def main() -> int:
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print(f"Kullanım: python -m bench {{{','.join(COMMANDS)}}} [seçenekler]")
+        return 2
+    return COMMANDS[sys.argv[1]](sys.argv[2:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+/v1/check yük testi: taklit upstream'lere yönlendirilmiş bir API sürecine sabit eşzamanlılıkla
+istek atar; throughput ve p50/p90/p99 gecikmeyi JSON olarak raporlar.
+
+    python -m bench.load --duration 30 --concurrency 50 --latency-ms 300 --out bench/results/load.json
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import List
+
+import httpx
+
+from bench.stubs import StubServer, add_stub_arguments, stub_config_from_args
+from bench.report import latency_summary, build_report, write_report, compare
+
+# Benchmark sürecinde gerçek Telegram/SerpAPI'ye gidilmemesi için kullanılan sahte kimlikler
+FAKE_BOT_TOKEN = "123456:BENCHbenchBENCHbenchBENCHbench"
+
+
+def app_env(stub_url: str, db_path: str, cache: bool) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SERPAPI_BASE_URL": stub_url,
+        "TELEGRAM_API_BASE": stub_url,
+        "SERPAPI_KEY": "bench-key",
+        "SERPAPI_KEYS": "",
+        "TELEGRAM_BOT_TOKEN": FAKE_BOT_TOKEN,
+        "BOT_UPDATE_MODE": "off",
+        "SCHEDULER_MODE": "cron",
+        "LOG_RETENTION_DAYS": "0",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    if not cache:
+        env["SERP_CACHE_TTL"] = "0"
+    return env
+
+
+def start_api(env: dict, port: int, workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(cmd, env=env, cwd=root)
+
+
+async def wait_healthy(base_url: str, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError("API süreci başlatılamadı.")
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("API süreci zamanında hazır olmadı.")
+
+
+async def run_load(base_url: str, duration: float, concurrency: int, queries: int, warmup: int) -> dict:
+    latencies: List[float] = []
+    status_counts = {}
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        for i in range(warmup):
+            await client.post("/v1/check", json={"query": f"warmup {i}"})
+
+        counter = 0
+        stop_at = time.monotonic() + duration
+
+        async def worker():
+            nonlocal counter, errors
+            while time.monotonic() < stop_at:
+                counter += 1
+                payload = {"query": f"bench sorgu {counter % queries}", "location": "Istanbul"}
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post("/v1/check", json=payload)
+                    status_counts[r.status_code] = status_counts.get(r.status_code, 0) + 1
+                    if r.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                    status_counts["transport_error"] = status_counts.get("transport_error", 0) + 1
+                latencies.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+
+    total = len(latencies)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "duration_s": round(elapsed, 2),
+        "rps": round(total / elapsed, 2) if elapsed else 0.0,
+        **latency_summary(latencies),
+        "status_counts": {str(k): v for k, v in status_counts.items()},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="/v1/check yük testi")
+    parser.add_argument("--duration", type=float, default=20, help="Ölçüm süresi (saniye)")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=1000, help="Döngüsel kullanılan farklı sorgu sayısı")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--cache", action="store_true", help="SERP sonuç önbelleğini açık bırak")
+    parser.add_argument("--api-port", type=int, default=18000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", help="JSON çıktı dosyası (yoksa stdout)")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="İzin verilen kötüleşme oranı")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    stub_config = stub_config_from_args(args)
+    base_url = f"http://127.0.0.1:{args.api_port}"
+    with tempfile.TemporaryDirectory() as tmp, StubServer(stub_config, port=args.stub_port) as stub:
+        proc = start_api(app_env(stub.base_url, os.path.join(tmp, "bench.db"), args.cache), args.api_port, args.workers)
+        try:
+            asyncio.run(wait_healthy(base_url, proc))
+            results = asyncio.run(run_load(base_url, args.duration, args.concurrency, args.queries, args.warmup))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=15)
+        results["upstream_calls"] = dict(stub_config.counters)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}
+    report = build_report("check_load", config, results)
+    write_report(report, args.out)
+    if args.baseline:
+        regressions = compare(report, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"GERİLEME: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
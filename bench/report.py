@@ -0,0 +1,91 @@
+import os
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+# Karşılaştırmada "küçük olan daha iyi" ve "büyük olan daha iyi" sayılan metrikler
+LOWER_IS_BETTER = ("p50_ms", "p90_ms", "p99_ms", "mean_ms", "duration_s", "error_rate")
+HIGHER_IS_BETTER = ("rps", "jobs_per_s")
+# Önceki değer 0 iken oran hesaplanamaz; bu mutlak eşiği aşan artış gerileme sayılır (varsayılan: her artış)
+ZERO_BASELINE_THRESHOLDS = {"error_rate": 0.01}
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Sıralı listede doğrusal enterpolasyonlu yüzdelik."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    values = sorted(latencies_ms)
+    if not values:
+        return {"p50_ms": 0.0, "p90_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(values, 50), 2),
+        "p90_ms": round(percentile(values, 90), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "mean_ms": round(sum(values) / len(values), 2),
+        "max_ms": round(values[-1], 2),
+    }
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def build_report(name: str, config: dict, results: dict) -> dict:
+    return {
+        "benchmark": name,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_rev": _git_rev(),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results,
+    }
+
+
+def write_report(report: dict, path: Optional[str]):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if not path:
+        print(text)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    print(f"Sonuçlar yazıldı: {path}")
+
+
+def compare(report: dict, baseline_path: str, tolerance: float) -> List[str]:
+    """
+    Sonuçları önceki bir rapora göre karşılaştırır; `tolerance` oranından (örn. 0.2 = %20)
+    fazla kötüleşen metrikleri döner. Önceki değeri 0 olan metrikler ZERO_BASELINE_THRESHOLDS'taki
+    mutlak eşikle karşılaştırılır. Boş liste: gerileme yok.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    current = report["results"]
+    regressions = []
+    for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+        if key not in current or key not in baseline:
+            continue
+        old, new = float(baseline[key]), float(current[key])
+        if old == 0:
+            # Büyük olan daha iyi metriklerde 0'dan kötüleşme olmaz
+            if key in LOWER_IS_BETTER and new > ZERO_BASELINE_THRESHOLDS.get(key, 0.0):
+                regressions.append(f"{key}: {old} -> {new}")
+            continue
+        change = (new - old) / old
+        worse = change > tolerance if key in LOWER_IS_BETTER else change < -tolerance
+        if worse:
+            regressions.append(f"{key}: {old} -> {new} ({change:+.0%})")
+    return regressions
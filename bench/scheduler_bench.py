@@ -0,0 +1,135 @@
+"""
+Zamanlayıcı turu benchmark'ı: geçici bir veritabanına N zamanı gelmiş görev ekler, taklit
+SerpAPI/Telegram'a karşı run_job_once çalıştırır ve tur süresi, görev/sn ve bildirim kuyruğunun
+boşalma süresini JSON olarak raporlar.
+
+    python -m bench.scheduler_bench --jobs 10000 --queries 500 --out bench/results/scheduler.json
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+from bench.stubs import StubServer, add_stub_arguments, stub_config_from_args
+from bench.report import build_report, write_report, compare
+from bench.load import FAKE_BOT_TOKEN
+
+
+def configure_env(stub_url: str, db_path: str):
+    """Uygulama modülleri import edilmeden önce çağrılmalı; ayarlar import anında okunur."""
+    os.environ.update({
+        "SERPAPI_BASE_URL": stub_url,
+        "TELEGRAM_API_BASE": stub_url,
+        "SERPAPI_KEY": "bench-key",
+        "SERPAPI_KEYS": "",
+        "TELEGRAM_BOT_TOKEN": FAKE_BOT_TOKEN,
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "SERP_CACHE_TTL": "0",
+        "SERP_DAILY_BUDGET": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # Boşalma süresinin kapanış zaman aşımıyla kesilmemesi için
+    os.environ.setdefault("NOTIFY_SHUTDOWN_TIMEOUT", "600")
+
+
+def seed_jobs(count: int, queries: int, chats: int):
+    from sqlalchemy import insert
+    from app.models import get_engine, ScheduledJob
+
+    due = datetime.utcnow() - timedelta(minutes=1)
+    rows = [
+        {
+            "query": f"bench sorgu {i % queries}",
+            "interval_minutes": 60,
+            "location": "Istanbul",
+            "device": "desktop",
+            "telegram_user_id": str(1000 + i % chats),
+            "is_active": True,
+            "next_run_at": due,
+            "created_at": due,
+            "adaptive": False,
+            "notify_mode": "always",
+        }
+        for i in range(count)
+    ]
+    with get_engine().begin() as conn:
+        for start in range(0, len(rows), 1000):
+            conn.execute(insert(ScheduledJob), rows[start:start + 1000])
+
+
+async def run_tick() -> dict:
+    from app.models import init_db_async
+    from app.scheduler import run_job_once
+    from app.notifier import notifier
+    from app.log_sink import log_sink
+    from app.serp import close_client
+
+    await init_db_async()
+    try:
+        t0 = time.perf_counter()
+        stats = await run_job_once()
+        tick_s = time.perf_counter() - t0
+        # Tur bittiğinde bildirim ve log kuyruklarında kalanların boşalma süresi ayrıca ölçülür
+        t1 = time.perf_counter()
+        await notifier.stop()
+        await log_sink.stop()
+        drain_s = time.perf_counter() - t1
+        notifier_stats = notifier.stats()
+    finally:
+        await close_client()
+    return {
+        "jobs": stats["jobs"],
+        "queries": stats["queries"],
+        "deferred": stats["deferred"],
+        "duration_s": round(tick_s, 2),
+        "jobs_per_s": round(stats["jobs"] / tick_s, 2) if tick_s else 0.0,
+        "drain_s": round(drain_s, 2),
+        "notifier": notifier_stats,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Zamanlayıcı turu benchmark'ı")
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=500, help="Görevlerin paylaştığı farklı sorgu sayısı")
+    parser.add_argument("--chats", type=int, default=100, help="Bildirimlerin dağıtıldığı sohbet sayısı")
+    parser.add_argument("--concurrency", type=int, help="SCHEDULER_CONCURRENCY (verilmezse ortamdaki değer)")
+    parser.add_argument("--out", help="JSON çıktı dosyası (yoksa stdout)")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="İzin verilen kötüleşme oranı")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    stub_config = stub_config_from_args(args)
+    with tempfile.TemporaryDirectory() as tmp, StubServer(stub_config, port=args.stub_port) as stub:
+        configure_env(stub.base_url, os.path.join(tmp, "bench.db"))
+        if args.concurrency:
+            os.environ["SCHEDULER_CONCURRENCY"] = str(args.concurrency)
+        from app.logs import setup_logging
+        from app.models import init_db
+
+        setup_logging()
+        init_db()
+        t0 = time.perf_counter()
+        seed_jobs(args.jobs, args.queries, args.chats)
+        seed_s = time.perf_counter() - t0
+        results = asyncio.run(run_tick())
+        results["seed_s"] = round(seed_s, 2)
+        results["upstream_calls"] = dict(stub_config.counters)
+
+    config = {k: v for k, v in vars(args).items() if k not in ("out", "baseline")}
+    report = build_report("scheduler_tick", config, results)
+    write_report(report, args.out)
+    if args.baseline:
+        regressions = compare(report, args.baseline, args.tolerance)
+        for line in regressions:
+            print(f"GERİLEME: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+serpapi.com ve api.telegram.org için yerel taklit sunucular.
+
+Gecikme, hata oranları ve reklam yükü ayarlanabilir; uygulama SERPAPI_BASE_URL ve
+TELEGRAM_API_BASE ile bu sunuculara yönlendirilir. Tek başına çalıştırma:
+
+    python -m bench.stubs --port 18080 --latency-ms 300 --error-rate 0.02
+"""
+import random
+import asyncio
+import argparse
+import threading
+from dataclasses import dataclass, field
+from typing import Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class StubConfig:
+    # Yanıt gecikmesi: ortalama ± jitter (milisaniye)
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    # SerpAPI: 5xx ve 429 dönme olasılıkları
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    # Yanıtların kaçında reklam olacağı ve reklam sayısı
+    ad_rate: float = 0.5
+    ads_per_result: int = 3
+    # Telegram sendMessage gecikmesi ve 429 olasılığı
+    telegram_latency_ms: float = 50.0
+    telegram_rate_limit_rate: float = 0.0
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, name: str):
+        self.counters[name] = self.counters.get(name, 0) + 1
+
+
+async def _delay(mean_ms: float, jitter_ms: float):
+    ms = max(0.0, random.gauss(mean_ms, jitter_ms)) if jitter_ms else mean_ms
+    if ms:
+        await asyncio.sleep(ms / 1000)
+
+
+def _ads(q: str, count: int) -> list:
+    return [
+        {
+            "position": i,
+            "title": f"{q} - Reklam {i}",
+            "link": f"https://advertiser{i}.example.com/{q.replace(' ', '-')}",
+            "displayed_link": f"advertiser{i}.example.com",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def _organic(q: str, count: int = 10) -> list:
+    # Gerçek yanıtların hacmini taklit eder; json_restrictor kullanılırsa gönderilmez
+    return [
+        {
+            "position": i,
+            "title": f"{q} - Sonuç {i}",
+            "link": f"https://site{i}.example.com/{q.replace(' ', '-')}",
+            "snippet": f"{q} hakkında örnek açıklama metni. " * 8,
+            "sitelinks": {"inline": [{"title": f"Alt sayfa {j}", "link": f"https://site{i}.example.com/{j}"} for j in range(4)]},
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="Upstream stubs")
+
+    @app.get("/search")
+    async def search(request: Request):
+        config.count("serpapi_search")
+        await _delay(config.latency_ms, config.jitter_ms)
+        roll = random.random()
+        if roll < config.error_rate:
+            config.count("serpapi_5xx")
+            return JSONResponse({"error": "stub upstream error"}, status_code=503)
+        if roll < config.error_rate + config.rate_limit_rate:
+            config.count("serpapi_429")
+            return JSONResponse({"error": "stub rate limit"}, status_code=429)
+        q = request.query_params.get("q", "")
+        ads = _ads(q, config.ads_per_result) if random.random() < config.ad_rate else []
+        body = {
+            "search_metadata": {"status": "Success"},
+            "ads": ads,
+            "organic_results": _organic(q),
+            "related_searches": [{"query": f"{q} {i}"} for i in range(8)],
+        }
+        # SerpAPI json_restrictor'ın üst düzey alan seçimini taklit eder
+        restrictor = request.query_params.get("json_restrictor")
+        if restrictor:
+            fields = {f.strip() for f in restrictor.split(",")}
+            body = {k: v for k, v in body.items() if k in fields}
+        return body
+
+    @app.get("/account")
+    async def account():
+        return {"total_searches_left": 1_000_000}
+
+    @app.post("/bot{token}/sendMessage")
+    async def send_message(token: str, request: Request):
+        config.count("telegram_send")
+        await _delay(config.telegram_latency_ms, 0)
+        if random.random() < config.telegram_rate_limit_rate:
+            config.count("telegram_429")
+            return JSONResponse({"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}, status_code=429)
+        payload = await request.json()
+        return {"ok": True, "result": {"message_id": 1, "chat": {"id": payload.get("chat_id")}}}
+
+    return app
+
+
+class StubServer:
+    """Taklit sunucuyu ayrı bir thread'de (kendi event loop'uyla) çalıştırır; ölçülen süreçle CPU paylaşmaz."""
+
+    def __init__(self, config: StubConfig, host: str = "127.0.0.1", port: int = 18080):
+        self.config = config
+        self.host = host
+        self.port = port
+        self._server = uvicorn.Server(uvicorn.Config(create_app(config), host=host, port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError(f"Taklit sunucu başlatılamadı: {self.base_url}")
+            threading.Event().wait(0.05)
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    defaults = StubConfig()
+    parser.add_argument("--stub-port", type=int, default=18080)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate)
+    parser.add_argument("--ad-rate", type=float, default=defaults.ad_rate)
+    parser.add_argument("--ads-per-result", type=int, default=defaults.ads_per_result)
+    parser.add_argument("--telegram-latency-ms", type=float, default=defaults.telegram_latency_ms)
+    parser.add_argument("--telegram-rate-limit-rate", type=float, default=defaults.telegram_rate_limit_rate)
+
+
+def stub_config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        ad_rate=args.ad_rate,
+        ads_per_result=args.ads_per_result,
+        telegram_latency_ms=args.telegram_latency_ms,
+        telegram_rate_limit_rate=args.telegram_rate_limit_rate,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SerpAPI/Telegram taklit sunucuları")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(stub_config_from_args(args)), host="127.0.0.1", port=args.stub_port, log_level="warning")
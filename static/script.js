@@ -34,6 +34,66 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    const batchForm = document.getElementById('batch-form');
+    const batchResults = document.getElementById('batch-results');
+    const batchProgress = document.getElementById('batch-progress');
+
+    batchForm.addEventListener('submit', async (event) => {
+        event.preventDefault();
+        const queries = document.getElementById('batch-queries').value.split('\n').map(q => q.trim()).filter(q => q);
+        if (queries.length === 0) return;
+        const location = document.getElementById('batch-location').value || null;
+        const device = document.querySelector('input[name="batch-device"]:checked').value;
+        const payload = { items: queries.map(query => ({ query, device, location })) };
+
+        batchResults.innerHTML = '';
+        let done = 0;
+        const updateProgress = () => { batchProgress.textContent = `${done} / ${queries.length} tamamlandı`; };
+        batchProgress.classList.remove('hidden');
+        updateProgress();
+
+        const renderRow = (row) => {
+            const li = document.createElement('li');
+            // Sorgu ve hata metni kullanıcı/upstream kaynaklı; innerHTML yerine textContent ile yazılır
+            const queryEl = document.createElement('strong');
+            queryEl.textContent = row.query;
+            const statusEl = document.createElement('span');
+            if (row.error) {
+                li.className = 'error';
+                statusEl.textContent = `Hata: ${row.error}`;
+            } else if (row.result.has_ads) {
+                li.className = 'has-ads';
+                statusEl.textContent = `${row.result.ads_count} reklam`;
+            } else {
+                statusEl.textContent = 'Reklam yok';
+            }
+            li.append(queryEl, statusEl);
+            batchResults.appendChild(li);
+            done += 1;
+            updateProgress();
+        };
+
+        try {
+            const response = await fetch('/v1/check/batch', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(payload) });
+            if (!response.ok) { const errorData = await response.json(); throw new Error(JSON.stringify(errorData.detail) || 'API sunucusunda bir hata oluştu.'); }
+            // NDJSON akışı: her satır geldiği anda ekrana yazılır
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { value, done: streamDone } = await reader.read();
+                if (streamDone) break;
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.filter(line => line.trim()).forEach(line => renderRow(JSON.parse(line)));
+            }
+            if (buffer.trim()) renderRow(JSON.parse(buffer));
+        } catch (error) {
+            batchProgress.textContent = 'Hata: ' + error.message;
+        }
+    });
+
     const jobForm = document.getElementById('job-form');
     const jobList = document.getElementById('job-list');
 
@@ -46,7 +106,24 @@ document.addEventListener('DOMContentLoaded', () => {
             if (jobs.length === 0) { jobList.innerHTML = '<li>Aktif zamanlanmış görev bulunmuyor.</li>'; return; }
             jobs.forEach(job => {
                 const li = document.createElement('li');
-                li.innerHTML = `<span><strong>${job.query}</strong> (${job.location || 'Genel'}) - ${job.interval_minutes} dakikada bir</span><button class="delete-job" data-id="${job.id}">Sil</button>`;
+                const interval = job.effective_interval_minutes || job.interval_minutes;
+                const mode = (job.adaptive ? ' (uyarlanabilir)' : '') + (job.notify_mode === 'changes' ? ' [sadece değişiklik]' : '');
+                // Sorgu ve konum kullanıcı kaynaklı; toplu kontrol satırlarındaki gibi textContent ile yazılır
+                const textEl = document.createElement('span');
+                const queryEl = document.createElement('strong');
+                queryEl.textContent = job.query;
+                textEl.append(queryEl, ` (${job.location || 'Genel'}) - ${interval} dakikada bir${mode}`);
+                if (job.interval_reason) {
+                    const reasonEl = document.createElement('small');
+                    reasonEl.className = 'job-reason';
+                    reasonEl.textContent = job.interval_reason;
+                    textEl.append(document.createElement('br'), reasonEl);
+                }
+                const deleteButton = document.createElement('button');
+                deleteButton.className = 'delete-job';
+                deleteButton.dataset.id = job.id;
+                deleteButton.textContent = 'Sil';
+                li.append(textEl, deleteButton);
                 jobList.appendChild(li);
             });
         } catch (error) {
@@ -61,6 +138,8 @@ document.addEventListener('DOMContentLoaded', () => {
             query: document.getElementById('job-query').value,
             location: document.getElementById('job-location').value || null,
             interval_minutes: parseInt(document.getElementById('job-interval').value, 10),
+            adaptive: document.getElementById('job-adaptive').checked,
+            notify_mode: document.getElementById('job-changes-only').checked ? 'changes' : 'always',
             device: 'desktop'
         };
         try {
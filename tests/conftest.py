@@ -0,0 +1,15 @@
+import pytest
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine
+
+from app import models
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Her test için boş, bellek içi SQLite veritabanı (tüm thread'ler aynı bağlantıyı paylaşır)."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(models, "_engine", engine)
+    yield engine
+    engine.dispose()
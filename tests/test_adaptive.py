@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from sqlmodel import Session
+
+from app.adaptive import choose_interval
+from app.models import CreditBudget, ScheduledJob, take_budget_tokens, refund_budget_tokens
+
+
+def _job(**fields) -> ScheduledJob:
+    defaults = {"query": "q", "interval_minutes": 10, "adaptive": True}
+    defaults.update(fields)
+    return ScheduledJob(**defaults)
+
+
+def test_fixed_interval_records_history():
+    minutes, reason, history = choose_interval(_job(adaptive=False, ad_history="01"), {"has_ads": True})
+    assert (minutes, reason, history) == (10, "sabit aralık", "011")
+
+
+def test_state_change_drops_to_minimum():
+    job = _job(min_interval_minutes=5, effective_interval_minutes=40, ad_history="000")
+    minutes, _, history = choose_interval(job, {"has_ads": True})
+    assert (minutes, history) == (5, "0001")
+
+
+def test_stable_job_grows_up_to_maximum():
+    job = _job(max_interval_minutes=20, effective_interval_minutes=15, ad_history="1111")
+    assert choose_interval(job, {"has_ads": True})[0] == 20
+
+
+def test_volatile_job_shrinks():
+    job = _job(min_interval_minutes=2, effective_interval_minutes=40, ad_history="0101011")
+    assert choose_interval(job, {"has_ads": True})[0] == 20
+
+
+def test_failed_query_keeps_interval():
+    job = _job(effective_interval_minutes=30, ad_history="11")
+    assert choose_interval(job, None)[0] == 30
+
+
+def test_budget_bucket_refills_and_caps(db):
+    assert take_budget_tokens("b", 4, daily_budget=86400, burst=10) == (4, 6.0)
+    granted, left = take_budget_tokens("b", 20, daily_budget=86400, burst=10)
+    assert granted == 6 and left < 1
+
+    # 1 token/sn: 5 sn sonra 5 token; üst sınır burst
+    with Session(db) as session:
+        bucket = session.get(CreditBudget, "b")
+        bucket.updated_at -= timedelta(seconds=5)
+        session.add(bucket)
+        session.commit()
+    assert take_budget_tokens("b", 20, daily_budget=86400, burst=10)[0] == 5
+
+
+def test_refund_returns_tokens_up_to_burst(db):
+    take_budget_tokens("b", 8, daily_budget=86400, burst=10)
+    refund_budget_tokens("b", 3, burst=10)
+    refund_budget_tokens("b", -1, burst=10)
+    with Session(db) as session:
+        assert session.get(CreditBudget, "b").tokens == 4.0
+    refund_budget_tokens("b", 100, burst=10)
+    with Session(db) as session:
+        assert session.get(CreditBudget, "b").tokens == 10.0
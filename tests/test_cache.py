@@ -0,0 +1,76 @@
+import asyncio
+
+from app.cache import AsyncTTLCache
+
+
+def test_concurrent_loads_share_one_call():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_size=10)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "v"
+
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(5)))
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert calls == 1
+    # Yüklemeyi başlatan taze (None), katılanlar paylaşılan sonucu (yaş 0) alır
+    assert sorted(age is None for _, age in results) == [False] * 4 + [True]
+    assert {value for value, _ in results} == {"v"}
+
+
+def test_set_during_load_is_not_overwritten():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_size=10)
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            return "old"
+
+        load = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        cache.set("k", "new")
+        value, _ = await load
+        return value, cache.get("k")[0]
+
+    assert asyncio.run(scenario()) == ("new", "new")
+
+
+def test_max_age_zero_does_not_join_inflight_load():
+    async def scenario():
+        cache = AsyncTTLCache(ttl=60, max_size=10)
+        release_first = asyncio.Event()
+
+        async def slow_loader():
+            await release_first.wait()
+            return "first"
+
+        async def fresh_loader():
+            return "fresh"
+
+        first = asyncio.create_task(cache.get_or_load("k", slow_loader))
+        await asyncio.sleep(0)
+        fresh = await cache.get_or_load("k", fresh_loader, max_age=0)
+        release_first.set()
+        await first
+        return fresh, cache.get("k")[0]
+
+    fresh, stored = asyncio.run(scenario())
+    assert fresh == ("fresh", None)
+    # Önce başlamış yükleme sonradan bitse de daha yeni sonucu ezmez
+    assert stored == "fresh"
+
+
+def test_lru_evicts_oldest_entry():
+    cache = AsyncTTLCache(ttl=60, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a")[0] == 1
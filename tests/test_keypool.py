@@ -0,0 +1,48 @@
+import asyncio
+
+from app.keypool import ApiKey, KeyPool, NoKeyAvailableError
+
+
+def test_waiters_fail_fast_when_only_key_is_disabled():
+    """Tek anahtar, eşzamanlılık 1: ilk istek 401 alınca bekleyen tüm istekler hata almalı, asılı kalmamalı."""
+
+    async def scenario():
+        pool = KeyPool([ApiKey("only-key", concurrency=1)])
+        outcomes = []
+
+        async def call(first: bool):
+            try:
+                async with pool.acquire() as key:
+                    if first:
+                        # Diğerleri bu sırada slot bekliyor
+                        await asyncio.sleep(0.05)
+                        await pool.report_status(key, 401)
+                outcomes.append("ok")
+            except NoKeyAvailableError:
+                outcomes.append("nokey")
+
+        tasks = [asyncio.create_task(call(True))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(call(False)) for _ in range(3)]
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=2)
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+    assert sorted(outcomes) == ["nokey", "nokey", "nokey", "ok"]
+
+
+def test_release_wakes_waiter_when_key_is_free():
+    async def scenario():
+        pool = KeyPool([ApiKey("only-key", concurrency=1)])
+        order = []
+
+        async def call(name: str):
+            async with pool.acquire():
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await asyncio.wait_for(asyncio.gather(*(call(str(i)) for i in range(4))), timeout=2)
+        return order
+
+    assert len(asyncio.run(scenario())) == 4
+
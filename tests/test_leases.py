@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+
+from app.models import ScheduledJob, add_job, claim_due_jobs, complete_jobs
+
+
+def _job(query: str, minutes_ago: int = 1, **fields) -> ScheduledJob:
+    return add_job(ScheduledJob(query=query, interval_minutes=10,
+                                next_run_at=datetime.utcnow() - timedelta(minutes=minutes_ago), **fields))
+
+
+def test_claim_returns_due_jobs_oldest_first(db):
+    newer = _job("newer", minutes_ago=1)
+    older = _job("older", minutes_ago=5)
+    _job("future", minutes_ago=-10)
+    _job("inactive", is_active=False)
+
+    claimed = claim_due_jobs("w1", limit=10)
+    assert [job.id for job in claimed] == [older.id, newer.id]
+    assert all(job.lease_owner == "w1" for job in claimed)
+
+
+def test_leased_jobs_are_not_claimed_twice(db):
+    _job("a")
+    _job("b")
+    first = claim_due_jobs("w1", limit=1)
+    second = claim_due_jobs("w2", limit=10)
+    assert len(first) == 1 and len(second) == 1
+    assert first[0].id != second[0].id
+    assert claim_due_jobs("w3", limit=10) == []
+
+
+def test_expired_lease_can_be_taken_over(db):
+    job = _job("a")
+    claim_due_jobs("w1", lease_seconds=-1)
+    claimed = claim_due_jobs("w2")
+    assert [j.id for j in claimed] == [job.id]
+    assert claimed[0].lease_owner == "w2"
+
+
+def test_complete_releases_lease_and_advances_next_run(db):
+    job = _job("a")
+    claimed = claim_due_jobs("w1")
+    complete_jobs("w1", claimed)
+
+    with Session(db) as session:
+        stored = session.get(ScheduledJob, job.id)
+    assert stored.lease_owner is None and stored.lease_until is None
+    # next_run_at ilerletilmemişse interval_minutes kadar ileri alınır
+    assert stored.next_run_at > datetime.utcnow() + timedelta(minutes=9)
+
+
+def test_complete_ignores_jobs_leased_by_another_worker(db):
+    job = _job("a")
+    stale = claim_due_jobs("w1", lease_seconds=-1)
+    claim_due_jobs("w2")
+    complete_jobs("w1", stale)
+
+    with Session(db) as session:
+        assert session.get(ScheduledJob, job.id).lease_owner == "w2"
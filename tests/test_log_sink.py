@@ -0,0 +1,27 @@
+import asyncio
+
+from app import log_sink as log_sink_module
+from app.log_sink import LogSink
+
+
+def test_stop_flushes_every_submitted_row(monkeypatch):
+    written = []
+
+    async def add_logs(rows):
+        written.extend(rows)
+    monkeypatch.setattr(log_sink_module, "add_logs_async", add_logs)
+
+    async def scenario(delay: float):
+        sink = LogSink(batch_size=100, flush_ms=1000)
+        for i in range(5):
+            await sink.submit({"i": i})
+            # stop() worker'ı farklı anlarda (get() beklerken veya bitmek üzereyken) iptal etsin
+            await asyncio.sleep(delay)
+        await sink.stop()
+        return sink.stats()
+
+    for delay in (0, 0.001, 0.01):
+        written.clear()
+        stats = asyncio.run(scenario(delay))
+        assert sorted(row["i"] for row in written) == list(range(5))
+        assert stats["written"] == 5 and stats["dropped"] == 0
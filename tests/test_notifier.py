@@ -0,0 +1,62 @@
+import time
+import asyncio
+
+from app import notifier as notifier_module
+from app.notifier import TelegramNotifier, MERGE_SEPARATOR, MAX_MESSAGE_LENGTH, _merge_messages
+
+
+def _fake_sender(responses=()):
+    """Gönderimleri kaydeden _send yerine geçen fonksiyon; responses sırayla döner, sonra hep başarılı."""
+    calls = []
+    queued = list(responses)
+
+    async def send(chat_id, text):
+        calls.append((chat_id, text, time.monotonic()))
+        return queued.pop(0) if queued else (True, None, "", False)
+
+    return send, calls
+
+
+def test_alerts_to_same_chat_are_merged(monkeypatch):
+    monkeypatch.setattr(notifier_module, "NOTIFY_MERGE_WINDOW_MS", 50)
+
+    async def scenario():
+        n = TelegramNotifier(token="t")
+        n._send, calls = _fake_sender()
+        for text in ("a", "b", "c"):
+            n.notify("1", text)
+        n.notify("2", "d")
+        await asyncio.sleep(0.1)
+        await n.stop()
+        return calls, n.stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert sorted((chat, text) for chat, text, _ in calls) == [("1", MERGE_SEPARATOR.join("abc")), ("2", "d")]
+    assert stats["sent"] == 2
+
+
+def test_merge_respects_message_limit():
+    texts = ["x" * (MAX_MESSAGE_LENGTH // 2)] * 3
+    merged = _merge_messages(texts)
+    assert len(merged) == 3
+    assert all(len(m) <= MAX_MESSAGE_LENGTH for m in merged)
+
+
+def test_flood_wait_delays_other_chats(monkeypatch):
+    monkeypatch.setattr(notifier_module, "NOTIFY_MERGE_WINDOW_MS", 0)
+
+    async def scenario():
+        n = TelegramNotifier(token="t")
+        n._send, calls = _fake_sender([(False, 0.3, "429", True)])
+        n.notify("1", "a")
+        await asyncio.sleep(0.05)
+        n.notify("2", "b")
+        await n.stop()
+        return calls
+
+    calls = asyncio.run(scenario())
+    flood_at = calls[0][2]
+    other = next(at for chat, _, at in calls if chat == "2")
+    # 429 bekleme süresi sadece o sohbete değil tüm bota uygulanır
+    assert other - flood_at >= 0.25
+    assert [chat for chat, _, _ in calls].count("1") == 2
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from sqlalchemy import insert
+from sqlmodel import Session
+
+from app import models
+from app.models import SearchLog, RollupState, add_logs, backfill_rollups, query_stats
+
+
+def _row(query: str = "Kredi  Kartı", has_ads: bool = True, latency_ms: int = 100, **fields) -> dict:
+    row = {"query": query, "has_ads": has_ads, "ads_count": 2 if has_ads else 0, "types": "search",
+           "device": "desktop", "gl": "tr", "hl": "tr", "latency_ms": latency_ms,
+           "created_at": datetime(2026, 1, 5, 10, 30), "cached": False}
+    row.update(fields)
+    return row
+
+
+def _init_db(monkeypatch):
+    monkeypatch.setattr(models, "_schema_ready", False)
+    models.init_db(force=True)
+
+
+def test_live_writes_accumulate_and_skip_cached(db):
+    add_logs([_row(latency_ms=100), _row(has_ads=False, latency_ms=300)])
+    add_logs([_row(query="kredi kartı", latency_ms=200), _row(cached=True, latency_ms=0)])
+
+    (day,) = query_stats("day", query="KREDI kartı")
+    assert day["checks"] == 3
+    assert day["with_ads"] == 2
+    assert day["avg_latency_ms"] == 200
+    (hour,) = query_stats("hour")
+    assert hour["bucket"] == datetime(2026, 1, 5, 10)
+
+
+def test_backfill_counts_old_logs_once(db, monkeypatch):
+    # Rollup'lardan önce yazılmış loglar
+    with Session(db) as session:
+        session.execute(insert(SearchLog), [_row(), _row()])
+        session.commit()
+    _init_db(monkeypatch)
+    # Sınır kaydedildikten sonra, backfill başlamadan gelen canlı yazma
+    add_logs([_row()])
+
+    backfill_rollups(chunk_size=1)
+    backfill_rollups()
+
+    (day,) = query_stats("day")
+    assert day["checks"] == 3
+    with Session(db) as session:
+        state = session.get(RollupState, "searchlog")
+    assert state.done and state.cutoff_log_id == 2 and state.last_log_id == 2
+
+
+def test_empty_database_needs_no_backfill(db, monkeypatch):
+    _init_db(monkeypatch)
+    with Session(db) as session:
+        assert session.get(RollupState, "searchlog").done
@@ -0,0 +1,93 @@
+import socket
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from app import adaptive, scheduler, serp
+from app.cache import AsyncTTLCache
+from app.keypool import KeyPool, parse_keys
+from app.models import CreditBudget, ScheduledJob, add_job, claim_due_jobs
+from bench.stubs import StubConfig, StubServer
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    """Zamanlayıcıyı taklit SerpAPI'ye bağlar; günlük bütçe 1 kredi/sn, kova 10 kredi."""
+    config = StubConfig(latency_ms=0, jitter_ms=0)
+    with StubServer(config, port=_free_port()) as server:
+        monkeypatch.setattr(serp, "SERPAPI_SEARCH_URL", f"{server.base_url}/search")
+        monkeypatch.setattr(serp, "_key_pool", KeyPool(parse_keys("test-key")))
+        monkeypatch.setattr(serp, "_result_cache", AsyncTTLCache(ttl=60, max_size=100))
+        monkeypatch.setattr(serp, "_client", None)
+        monkeypatch.setattr(adaptive, "SERP_DAILY_BUDGET", 86400)
+        monkeypatch.setattr(adaptive, "SERP_BUDGET_BURST", 10)
+
+        async def submit(row):
+            pass
+        monkeypatch.setattr(scheduler.log_sink, "submit", submit)
+        yield config
+
+
+def _due_jobs(queries, location=None):
+    for q in queries:
+        add_job(ScheduledJob(query=q, interval_minutes=10, location=location,
+                             next_run_at=datetime.utcnow() - timedelta(minutes=1)))
+    return claim_due_jobs(scheduler.WORKER_ID)
+
+
+def _run(jobs):
+    async def scenario():
+        try:
+            return await scheduler.run_jobs(jobs)
+        finally:
+            await serp.close_client()
+    return asyncio.run(scenario())
+
+
+def _tokens(db) -> float:
+    with Session(db) as session:
+        return session.get(CreditBudget, adaptive.BUDGET_NAME).tokens
+
+
+def test_budget_reserves_worst_case_and_refunds_unused(db, stub):
+    stub.ad_rate = 0
+    # Konumlu sorgu: 3 strateji x (1 + 2 tekrar) = 9 kredi ayrılır, reklam yoksa 3 istek yapılır
+    stats = _run(_due_jobs([f"sorgu {i}" for i in range(5)], location="Ankara"))
+
+    assert stats["queries"] == 1 and stats["deferred"] == 4
+    assert stub.counters["serpapi_search"] == 3
+    assert _tokens(db) == pytest.approx(7, abs=0.5)
+
+
+def test_cache_hits_do_not_spend_budget(db, stub, monkeypatch):
+    monkeypatch.setattr(adaptive, "SERP_BUDGET_BURST", 20)
+    stub.ad_rate = 1
+    _run(_due_jobs(["a", "b"]))
+    assert stub.counters["serpapi_search"] == 2
+    before = _tokens(db)
+
+    _run(_due_jobs(["a", "b"]))
+    assert stub.counters["serpapi_search"] == 2
+    assert _tokens(db) == pytest.approx(before, abs=0.5)
+
+
+def test_budget_error_defers_instead_of_running(db, stub, monkeypatch):
+    async def broken(*args):
+        raise RuntimeError("db down")
+    monkeypatch.setattr(adaptive, "take_budget_tokens_async", broken)
+
+    stats = _run(_due_jobs(["a", "b"]))
+    assert stats == {"jobs": 0, "queries": 0, "deferred": 2}
+    assert "serpapi_search" not in stub.counters
+    with Session(db) as session:
+        jobs = list(session.exec(select(ScheduledJob)))
+    assert all(job.next_run_at > datetime.utcnow() + timedelta(seconds=30) for job in jobs)
+    assert all(job.interval_reason.startswith("kredi bütçesi okunamadı") for job in jobs)
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app.models import record_ad_changes, list_ad_history
+from app.snapshots import (
+    snapshot_entries, fingerprint, encode_entries, decode_entries, diff_entries, advertisers_changed,
+)
+
+
+def test_fingerprint_depends_on_order_and_content():
+    a = [("a.com", "A"), ("b.com", "B")]
+    assert fingerprint(a) == fingerprint(decode_entries(encode_entries(a)))
+    assert fingerprint(a) != fingerprint(list(reversed(a)))
+    assert fingerprint(a) != fingerprint([("a.com", "A2"), ("b.com", "B")])
+
+
+def test_snapshot_entries_from_result():
+    result = {"ads": [{"domain": "a.com", "title": "A"}, {"title": "no domain"}]}
+    assert snapshot_entries(result) == [("a.com", "A"), ("", "no domain")]
+
+
+def test_diff_reports_added_removed_moved_and_retitled():
+    old = [("a.com", "A"), ("b.com", "B"), ("c.com", "C")]
+    new = [("b.com", "B yeni"), ("a.com", "A"), ("d.com", "D")]
+    diff = diff_entries(old, new)
+    assert diff["added"] == [(3, "d.com", "D")]
+    assert diff["removed"] == [(3, "c.com", "C")]
+    assert sorted(diff["moved"]) == [("a.com", 1, 2), ("b.com", 2, 1)]
+    assert diff["retitled"] == [(1, "b.com", "B yeni")]
+    assert advertisers_changed(diff)
+
+
+def test_title_only_change_is_not_an_advertiser_change():
+    diff = diff_entries([("a.com", "A")], [("a.com", "A2")])
+    assert not advertisers_changed(diff)
+
+
+def test_first_snapshot_is_all_added():
+    assert diff_entries(None, [("a.com", "A")])["added"] == [(1, "a.com", "A")]
+
+
+def test_concurrent_snapshot_insert_does_not_lose_history(db):
+    entries = [("a.com", "A")]
+    fp = fingerprint(entries)
+
+    # Aynı seti başka bir grup, bu grubun varlık kontrolünden sonra ama INSERT'inden önce yazmış gibi
+    @event.listens_for(db, "before_cursor_execute")
+    def race(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO adsnapshot"):
+            cursor.connection.execute("INSERT INTO adsnapshot (fingerprint, ads, created_at) VALUES (?, ?, ?)",
+                                      (fp, encode_entries(entries), datetime.utcnow().isoformat(" ")))
+
+    try:
+        record_ad_changes({fp: encode_entries(entries)}, [{"job_id": 1, "fingerprint": fp, "created_at": datetime.utcnow()}])
+    finally:
+        event.remove(db, "before_cursor_execute", race)
+
+    (row,) = list_ad_history(1)
+    assert row["fingerprint"] == fp and row["ads"] == [["a.com", "A"]]